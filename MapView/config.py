@@ -2,3 +2,26 @@ import os
 
 STORE_HOST = os.environ.get("STORE_HOST") or "localhost"
 STORE_PORT = os.environ.get("STORE_PORT") or 8000
+
+# Reconnect backoff for the store websocket, in seconds
+RECONNECT_MIN_DELAY = float(os.environ.get("RECONNECT_MIN_DELAY") or 1)
+RECONNECT_MAX_DELAY = float(os.environ.get("RECONNECT_MAX_DELAY") or 30)
+# Max number of points fetched from the store after a reconnect
+BACKFILL_LIMIT = int(os.environ.get("BACKFILL_LIMIT") or 5000)
+# Ids before the newest received that a backfill asks for again: with several
+# store workers, transactions commit out of id order and a lower id can arrive late
+BACKFILL_OVERLAP = int(os.environ.get("BACKFILL_OVERLAP") or 1000)
+# Recently received ids remembered to drop duplicates; must exceed BACKFILL_OVERLAP
+SEEN_IDS_SIZE = int(os.environ.get("SEEN_IDS_SIZE") or 10000)
+# Max number of points waiting to be drawn by the UI
+POINTS_BUFFER_SIZE = int(os.environ.get("POINTS_BUFFER_SIZE") or 10000)
+
+# Playback of a stored track instead of live data (enabled when PLAYBACK_USER_ID is set)
+PLAYBACK_USER_ID = os.environ.get("PLAYBACK_USER_ID")
+PLAYBACK_START = os.environ.get("PLAYBACK_START")
+PLAYBACK_END = os.environ.get("PLAYBACK_END")
+# Track seconds replayed per real second
+PLAYBACK_SPEED = float(os.environ.get("PLAYBACK_SPEED") or 1)
+PLAYBACK_CHUNK_SIZE = int(os.environ.get("PLAYBACK_CHUNK_SIZE") or 500)
+# Chunks loaded ahead of the playback position
+PLAYBACK_PREFETCH_CHUNKS = int(os.environ.get("PLAYBACK_PREFETCH_CHUNKS") or 8)
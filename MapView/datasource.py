@@ -1,10 +1,23 @@
 import asyncio
 import json
+import threading
+from collections import deque
 from datetime import datetime
+import requests
 import websockets
 from kivy import Logger
 from pydantic import BaseModel, field_validator
-from config import STORE_HOST, STORE_PORT
+from projection import mercator
+from config import (
+    STORE_HOST,
+    STORE_PORT,
+    RECONNECT_MIN_DELAY,
+    RECONNECT_MAX_DELAY,
+    BACKFILL_LIMIT,
+    BACKFILL_OVERLAP,
+    SEEN_IDS_SIZE,
+    POINTS_BUFFER_SIZE,
+)
 
 
 # Pydantic models
@@ -32,35 +45,103 @@ class ProcessedAgentData(BaseModel):
 
 
 class Datasource:
+    """
+    Receives points from the store websocket in a worker thread with its own
+    event loop, so JSON decoding and map projection never run on the UI
+    thread. Points are handed over through a deque, whose append and popleft
+    are atomic, so neither side takes a lock.
+    """
+
     def __init__(self):
         self.index = 0
         self.connection_status = None
-        self._new_points = []
-        asyncio.ensure_future(self.connect_to_server())
+        # Bounded ring buffer: when the UI stalls the oldest points are dropped
+        self._new_points = deque(maxlen=POINTS_BUFFER_SIZE)
+        self.overflow_count = 0
+        # Resume token: highest id received from the store
+        self._last_id = None
+        # Ids received recently, oldest first, to drop duplicates that arrive out of order
+        self._seen_ids = set()
+        self._seen_order = deque()
+        threading.Thread(target=self._run, name="datasource", daemon=True).start()
+
+    def _run(self):
+        asyncio.run(self.connect_to_server())
 
     def get_new_points(self):
-        Logger.debug(self._new_points)
-        points = self._new_points
-        self._new_points = []
+        """Points received since the last call: (latitude, longitude, road_state, x, y)"""
+        points = []
+        # Only what is there now; the worker may keep appending meanwhile
+        for _ in range(len(self._new_points)):
+            points.append(self._new_points.popleft())
         return points
 
     async def connect_to_server(self):
         uri = f"ws://{STORE_HOST}:{STORE_PORT}/ws/"
-        try:
-            async with websockets.connect(uri) as websocket:
-                while True:
-                    data = await websocket.recv()
-                    parsed_data = json.loads(data)
-                    if not parsed_data:
-                        continue
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async with websockets.connect(uri) as websocket:
+                    self.connection_status = "connected"
+                    delay = RECONNECT_MIN_DELAY
+                    # Messages arriving while we backfill are buffered by
+                    # the websocket and deduplicated by id afterwards
+                    await self.backfill()
+                    while True:
+                        data = await websocket.recv()
+                        parsed_data = json.loads(data)
+                        if not parsed_data:
+                            continue
+                        self.add_point(parsed_data)
+            except Exception as e:
+                Logger.warning(f"Datasource: connection to {uri} lost: {e}")
+
+            self.connection_status = "disconnected"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
 
-                    self._new_points.append((
-                        parsed_data["latitude"],
-                        parsed_data["longitude"],
-                        parsed_data["road_state"]
-                    ))
-        except Exception as e:
-            print(e)
+    async def backfill(self):
+        """Fetch points missed while disconnected in one bulk request"""
+        if self._last_id is None:
+            return
+        url = f"http://{STORE_HOST}:{STORE_PORT}/processed_agent_data/"
+        # Overlapping the points already received catches lower ids committed late
+        since_id = max(0, self._last_id - BACKFILL_OVERLAP)
+        params = {"since_id": since_id, "limit": BACKFILL_LIMIT}
+        response = await asyncio.to_thread(requests.get, url, params=params, timeout=10)
+        response.raise_for_status()
+        missed = response.json()
+        Logger.info(f"Datasource: backfilled {len(missed)} points after id {since_id}")
+        if len(missed) >= BACKFILL_LIMIT:
+            Logger.warning(
+                f"Datasource: backfill hit BACKFILL_LIMIT ({BACKFILL_LIMIT}), "
+                f"points after id {missed[-1]['id']} up to the live stream are missing"
+            )
+        for item in missed:
+            self.add_point(item)
+
+    def add_point(self, data):
+        point_id = data.get("id")
+        if point_id is not None:
+            if point_id in self._seen_ids:
+                return  # Already received
+            self._seen_ids.add(point_id)
+            self._seen_order.append(point_id)
+            if len(self._seen_order) > SEEN_IDS_SIZE:
+                self._seen_ids.discard(self._seen_order.popleft())
+            if self._last_id is None or point_id > self._last_id:
+                self._last_id = point_id
+
+        if len(self._new_points) == self._new_points.maxlen:
+            self.overflow_count += 1
+        x, y = mercator(data["latitude"], data["longitude"])
+        self._new_points.append((
+            data["latitude"],
+            data["longitude"],
+            data["road_state"] or "normal",
+            x,
+            y,
+        ))
 
     def handle_received_data(self, data):
         # Update your UI or perform actions with received data here
@@ -72,12 +153,5 @@ class Datasource:
             ],
             key=lambda v: v.timestamp,
         )
-        new_points = [
-            (
-                processed_agent_data.latitude,
-                processed_agent_data.longitude,
-                processed_agent_data.road_state,
-            )
-            for processed_agent_data in processed_agent_data_list
-        ]
-        self._new_points.extend(new_points)
\ No newline at end of file
+        for processed_agent_data in processed_agent_data_list:
+            self.add_point(processed_agent_data.model_dump())
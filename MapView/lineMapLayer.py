@@ -1,25 +1,30 @@
 from kivy_garden.mapview import MapLayer, MapMarker
 from kivy.graphics import Color, Line
 from kivy.graphics.context_instructions import Translate, Scale, PushMatrix, PopMatrix
-from kivy_garden.mapview.utils import clamp
-from kivy_garden.mapview.constants import (MIN_LONGITUDE, MAX_LONGITUDE, MIN_LATITUDE, MAX_LATITUDE)
-from math import radians, log, tan, cos, pi
+from collections import OrderedDict
+from projection import mercator
 
 
 class LineMapLayer(MapLayer):
+    # Zoom levels whose vertex buffers are kept, so zooming back does not recompute them
+    VERTEX_CACHE_SIZE = 4
+
     def __init__(self, coordinates=None, color=[0, 0, 1, 1], width=2, **kwargs):
         super().__init__(**kwargs)
         # if coordinates is None:
         #     coordinates = [[0, 0], [0, 0]]
         self._coordinates = coordinates
         self.color = color
-        self._line_points = None
-        self._line_points_offset = (0, 0)
+        # Mercator position of every coordinate as a fraction of the map size, flat x, y pairs
+        self._projected = []
+        # Map size -> (offset, flat vertices relative to it), most recently used last
+        self._vertices = OrderedDict()
         self.zoom = 0
         self.lon = 0
         self.lat = 0
         self.ms = 0
         self._width = width
+        self._project(coordinates or [])
 
     @property
     def coordinates(self):
@@ -29,57 +34,78 @@ class LineMapLayer(MapLayer):
     def coordinates(self, coordinates):
         self._coordinates = coordinates
         self.invalidate_line_points()
+        self._project(coordinates or [])
         self.clear_and_redraw()
 
     def add_point(self, point):
+        self.add_points([(point[0], point[1], *mercator(point[0], point[1]))])
+
+    def add_points(self, points):
+        """
+        Append (latitude, longitude, x, y) points, x and y from projection.mercator()
+        as precomputed by the datasource; redraws once for all of them.
+        """
+        if not points:
+            return
         if self._coordinates is None:
-            #self._coordinates = [point]
             self._coordinates = []
-        self._coordinates.append(point)
-        # self._coordinates = [self._coordinates[-1], point]
-        self.invalidate_line_points()
+        for latitude, longitude, x, y in points:
+            self._coordinates.append((latitude, longitude))
+            self._projected.append(x)
+            self._projected.append(y)
         self.clear_and_redraw()
 
     @property
     def line_points(self):
-        if self._line_points is None:
-            self.calc_line_points()
-        return self._line_points
+        return self.calc_line_points()[1]
 
     @property
     def line_points_offset(self):
-        if self._line_points is None:
-            self.calc_line_points()
-        return self._line_points_offset
+        return self.calc_line_points()[0]
 
     def calc_line_points(self):
-        if not self.coordinates or len(self.coordinates) == 0:
-            return  # If coordinates are empty, do nothing
-
-        # Compute offset for more accurate line rendering
-        self._line_points_offset = (self.get_x(self.coordinates[0][1]),
-                                    self.get_y(self.coordinates[0][0]))
-
-        self._line_points = [(self.get_x(lon) - self._line_points_offset[0],
-                              self.get_y(lat) - self._line_points_offset[1])
-                             for lat, lon in self.coordinates]
+        """
+        Vertices for the current map size, scaled from the projected points.
+        Cached per zoom level and extended with the points added since.
+        """
+        if not self._projected or not self.ms:
+            return (0, 0), []
+        ms = self.ms
+        entry = self._vertices.get(ms)
+        if entry is None:
+            # Offset by the first point for more accurate line rendering
+            entry = ((self._projected[0] * ms, self._projected[1] * ms), [])
+            self._vertices[ms] = entry
+            if len(self._vertices) > self.VERTEX_CACHE_SIZE:
+                self._vertices.popitem(last=False)
+        else:
+            self._vertices.move_to_end(ms)
+        (offset_x, offset_y), vertices = entry
+        projected = self._projected
+        for i in range(len(vertices), len(projected), 2):
+            vertices.append(projected[i] * ms - offset_x)
+            vertices.append(projected[i + 1] * ms - offset_y)
+        return entry
 
     def invalidate_line_points(self):
-        self._line_points = None
-        self._line_points_offset = (0, 0)
+        self._vertices.clear()
+
+    def _project(self, coordinates):
+        self._projected = []
+        for latitude, longitude in coordinates:
+            self._projected.extend(mercator(latitude, longitude))
 
     def get_x(self, lon):
         """Get the x position on the map using this map source's projection
         (0, 0) is located at the top left.
         """
-        return clamp(lon, MIN_LONGITUDE, MAX_LONGITUDE) * self.ms / 360.0
+        return mercator(0, lon)[0] * self.ms
 
     def get_y(self, lat):
         """Get the y position on the map using this map source's projection
         (0, 0) is located at the top left.
         """
-        lat = radians(clamp(-lat, MIN_LATITUDE, MAX_LATITUDE))
-        return (1.0 - log(tan(lat) + 1.0 / cos(lat)) / pi) * self.ms / 2.0
+        return mercator(lat, 0)[1] * self.ms
 
     # Function called when the MapView is moved
     def reposition(self):
@@ -91,8 +117,8 @@ class LineMapLayer(MapLayer):
                 self.lon != round(map_view.lon, 7) or \
                 self.lat != round(map_view.lat, 7):
             map_source = map_view.map_source
+            # Vertices of each zoom level stay cached, a pan only redraws
             self.ms = pow(2.0, map_view.zoom) * map_source.dp_tile_size
-            self.invalidate_line_points()
             self.clear_and_redraw()
 
     def clear_and_redraw(self, *args):
@@ -128,10 +154,10 @@ class LineMapLayer(MapLayer):
 
             Translate(self.ms / 2, 0)
 
-            if self.line_points_offset:
-                Translate(*self.line_points_offset)
+            offset, vertices = self.calc_line_points()
+            Translate(*offset)
 
             Color(*self.color)
-            Line(points=self.line_points, width=self._width)
+            Line(points=vertices, width=self._width)
             PopMatrix()
 
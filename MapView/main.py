@@ -2,20 +2,46 @@ import asyncio
 from kivy.app import App
 from kivy_garden.mapview import MapMarker, MapView
 from kivy.clock import Clock
+from kivy.core.window import Window
 from datasource import Datasource
+from playback import TrackPlayback
 from lineMapLayer import LineMapLayer  # Import the line drawing layer
+from config import PLAYBACK_USER_ID, PLAYBACK_START, PLAYBACK_END, PLAYBACK_SPEED
 
 
 class MapViewApp(App):
     def __init__(self, **kwargs):
         super().__init__()
-        self.datasource = Datasource()
+        if PLAYBACK_USER_ID:
+            self.datasource = TrackPlayback(
+                PLAYBACK_USER_ID, PLAYBACK_START, PLAYBACK_END, PLAYBACK_SPEED
+            )
+        else:
+            self.datasource = Datasource()
+        self._paused_speed = PLAYBACK_SPEED
         self.car_marker = None
         self.line_layer = LineMapLayer(coordinates=[], color=[1, 0, 0, 1], width=2)  # Red line for path
 
     def on_start(self):
         self.mapview.add_layer(self.line_layer)  # Add the line layer to the map
-        Clock.schedule_interval(self.update, 1)
+        if isinstance(self.datasource, TrackPlayback):
+            Window.bind(on_key_down=self.on_key_down)
+            Clock.schedule_interval(self.update, 0.1)
+        else:
+            Clock.schedule_interval(self.update, 1)
+
+    def on_key_down(self, window, key, scancode, codepoint, modifiers):
+        """Playback controls: "+" / "-" change speed, space pauses"""
+        if codepoint in ("+", "="):
+            self.datasource.set_speed((self.datasource.speed or 0.5) * 2)
+        elif codepoint == "-":
+            self.datasource.set_speed(self.datasource.speed / 2)
+        elif codepoint == " ":
+            if self.datasource.speed:
+                self._paused_speed = self.datasource.speed
+                self.datasource.set_speed(0)
+            else:
+                self.datasource.set_speed(self._paused_speed)
 
     def update(self, *args):
         new_points = self.datasource.get_new_points()
@@ -23,24 +49,23 @@ class MapViewApp(App):
         if not new_points:
             return
 
-        for latitude, longitude, road_state in new_points:
-            if self.car_marker is None:
-                self.car_marker = MapMarker(lat=latitude, lon=longitude, source="images/car.png")
-                self.mapview.add_marker(self.car_marker)
-                self.mapview.center_on(latitude, longitude)
-
-            self.update_car_marker((latitude, longitude))
-
-            if self.line_layer.coordinates is None:
-                self.line_layer.coordinates = [(latitude, longitude)]
-            else:
-                self.line_layer.add_point((latitude, longitude))
+        # Projected by the datasource's thread; the line is redrawn once per tick
+        self.line_layer.add_points([
+            (latitude, longitude, x, y) for latitude, longitude, _, x, y in new_points
+        ])
 
+        for latitude, longitude, road_state, _, _ in new_points:
             if road_state == "pothole":
                 self.set_pothole_marker((latitude, longitude))
             elif road_state == "bump":
                 self.set_bump_marker((latitude, longitude))
 
+        latitude, longitude = new_points[-1][:2]
+        if self.car_marker is None:
+            self.car_marker = MapMarker(lat=latitude, lon=longitude, source="images/car.png")
+            self.mapview.add_marker(self.car_marker)
+        self.update_car_marker((latitude, longitude))
+
     def update_car_marker(self, point):
         self.car_marker.lat, self.car_marker.lon = point
         self.mapview.center_on(point[0], point[1])
@@ -0,0 +1,102 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from kivy import Logger
+from projection import mercator
+
+from config import (
+    STORE_HOST,
+    STORE_PORT,
+    PLAYBACK_CHUNK_SIZE,
+    PLAYBACK_PREFETCH_CHUNKS,
+)
+
+
+class TrackPlayback:
+    """
+    Replays a device's stored track instead of live websocket data.
+    Has the same get_new_points() interface as Datasource. The track is
+    streamed from the store chunk by chunk in a background thread, so
+    playback starts after the first chunk and only a few chunks are held
+    in memory at a time.
+    """
+
+    def __init__(self, user_id, start=None, end=None, speed=1.0):
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.finished = False
+        self._chunks = queue.Queue(maxsize=PLAYBACK_PREFETCH_CHUNKS)
+        self._points = deque()
+        self._track_start = None
+        self._position = 0.0
+        self._last_tick = None
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def set_speed(self, speed):
+        """Change playback speed, 0 pauses"""
+        self.speed = max(speed, 0.0)
+        Logger.info(f"Playback: speed x{self.speed}")
+
+    def get_new_points(self):
+        """Return the points whose time has come since the previous call"""
+        now = time.monotonic()
+        if self._last_tick is not None:
+            self._position += (now - self._last_tick) * self.speed
+        self._last_tick = now
+
+        points = []
+        while self._next_point_ready():
+            points.append(self._points.popleft()[1:])
+        return points
+
+    def _next_point_ready(self):
+        if not self._points and not self._take_chunk():
+            return False
+        t = self._points[0][0]
+        if self._track_start is None:
+            self._track_start = t
+        return t - self._track_start <= self._position
+
+    def _take_chunk(self):
+        try:
+            chunk = self._chunks.get_nowait()
+        except queue.Empty:
+            return False
+        if chunk is None:
+            self.finished = True
+            return False
+        self._points.extend(zip(
+            chunk["t"], chunk["latitude"], chunk["longitude"], chunk["road_state"], chunk["x"], chunk["y"]
+        ))
+        return True
+
+    def _load(self):
+        url = f"http://{STORE_HOST}:{STORE_PORT}/processed_agent_data/track/{self.user_id}"
+        params = {"chunk_size": PLAYBACK_CHUNK_SIZE}
+        if self.start:
+            params["start"] = self.start
+        if self.end:
+            params["end"] = self.end
+        try:
+            with requests.get(url, params=params, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        # Projected here, off the UI thread
+                        chunk["x"], chunk["y"] = [], []
+                        for latitude, longitude in zip(chunk["latitude"], chunk["longitude"]):
+                            x, y = mercator(latitude, longitude)
+                            chunk["x"].append(x)
+                            chunk["y"].append(y)
+                        # Blocks while enough chunks are buffered ahead
+                        self._chunks.put(chunk)
+        except Exception as e:
+            Logger.error(f"Playback: failed to load track: {e}")
+        self._chunks.put(None)
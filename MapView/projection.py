@@ -0,0 +1,17 @@
+from math import radians, log, tan, cos, pi
+
+from kivy_garden.mapview.constants import MIN_LONGITUDE, MAX_LONGITUDE, MIN_LATITUDE, MAX_LATITUDE
+from kivy_garden.mapview.utils import clamp
+
+
+def mercator(latitude, longitude):
+    """
+    Position on the map as a fraction of the map size, the same at every zoom:
+    multiplied by the map size it gives LineMapLayer.get_x() / get_y().
+    Computed by the datasources' worker threads, so the UI thread only scales.
+    """
+    lat = radians(clamp(-latitude, MIN_LATITUDE, MAX_LATITUDE))
+    return (
+        clamp(longitude, MIN_LONGITUDE, MAX_LONGITUDE) / 360.0,
+        (1.0 - log(tan(lat) + 1.0 / cos(lat)) / pi) / 2.0,
+    )
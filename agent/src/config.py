@@ -14,5 +14,21 @@ MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "mqtt"
 MQTT_BROKER_PORT = try_parse(int, os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent"
 
-# Delay for sending data to mqtt in seconds
+# Delay between sensor samples in seconds; publishing runs separately
 DELAY = try_parse(float, os.environ.get("DELAY")) or 1
+# Samples buffered between the sampler and the publisher; more are dropped as overruns
+SAMPLE_BUFFER_SIZE = try_parse(int, os.environ.get("SAMPLE_BUFFER_SIZE")) or 4096
+# Most samples published per wakeup of the publisher
+PUBLISH_BATCH_SIZE = try_parse(int, os.environ.get("PUBLISH_BATCH_SIZE")) or 256
+# Seconds between sampler statistics printouts, 0 to disable
+STATS_INTERVAL = try_parse(float, os.environ.get("STATS_INTERVAL"))
+if STATS_INTERVAL is None:
+    STATS_INTERVAL = 60.0
+
+# Fraction of messages that carry a latency trace; traced messages take the hub's slower re-serializing path
+TRACE_SAMPLE_RATE = try_parse(float, os.environ.get("TRACE_SAMPLE_RATE"))
+if TRACE_SAMPLE_RATE is None:
+    TRACE_SAMPLE_RATE = 0.01
+
+# Message encoder: "fast" (hand-specialized) or "marshmallow"; both give the same JSON
+SERIALIZER = os.environ.get("SERIALIZER") or "fast"
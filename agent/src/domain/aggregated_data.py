@@ -1,13 +1,16 @@
 from dataclasses import dataclass
 
 from datetime import datetime
+from typing import Optional
 from domain.accelerometer import Accelerometer
 from domain.gps import Gps
 
 
-@dataclass
+@dataclass(slots=True)
 class AggregatedData:
     accelerometer: Accelerometer
     gps: Gps
     timestamp: datetime
     user_id: int
+    # {"id": ..., "hops": {stage: unix time}} for latency tracing
+    trace: Optional[dict] = None
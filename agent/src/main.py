@@ -1,8 +1,12 @@
 from paho.mqtt import client as mqtt_client
 import json
+import random
 import time
+import uuid
 from schema.aggregated_data_schema import AggregatedDataSchema
+from schema.aggregated_data_encoder import encode_aggregated_data
 from file_datasource import FileDatasource
+from sampler import Sampler
 import config
 
 
@@ -24,29 +28,49 @@ def connect_mqtt(broker, port):
     return client
 
 
-def publish(client, topic, datasource, delay):
-    datasource.startReading()
+aggregated_data_schema = AggregatedDataSchema()
+serialize = (
+    aggregated_data_schema.dumps if config.SERIALIZER == "marshmallow" else encode_aggregated_data
+)
+
+
+def new_trace():
+    """Start a latency trace for a sampled share of messages"""
+    if random.random() >= config.TRACE_SAMPLE_RATE:
+        return None
+    return {"id": uuid.uuid4().hex, "hops": {"agent_publish": time.time()}}
+
+
+def publish(client, topic, sampler):
+    """Send what the sampler buffered, in batches, as fast as the client takes it"""
+    sampler.start()
+    next_stats = time.monotonic() + config.STATS_INTERVAL
     while True:
-        time.sleep(delay)
-        data = datasource.read()
-        msg = AggregatedDataSchema().dumps(data)
-        result = client.publish(topic, msg)
-        # result: [0, 1]
-        status = result[0]
-        if status == 0:
-            pass
-            # print(f"Send `{msg}` to topic `{topic}`")
-        else:
-            print(f"Failed to send message to topic {topic}")
+        batch = sampler.drain(config.PUBLISH_BATCH_SIZE, timeout=1)
+        for data in batch:
+            data.trace = new_trace()
+            msg = serialize(data)
+            result = client.publish(topic, msg)
+            # result: [0, 1]
+            status = result[0]
+            if status == 0:
+                pass
+                # print(f"Send `{msg}` to topic `{topic}`")
+            else:
+                print(f"Failed to send message to topic {topic}")
+        if config.STATS_INTERVAL and time.monotonic() >= next_stats:
+            next_stats += config.STATS_INTERVAL
+            print(f"Sampler: {sampler.stats()}")
 
 
 def run():
     # Prepare mqtt client
     client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
-    # Prepare datasource
+    # Prepare datasource, sampled in its own thread
     datasource = FileDatasource("data/accelerometer.csv", "data/gps.csv")
+    sampler = Sampler(datasource, config.DELAY, config.SAMPLE_BUFFER_SIZE)
     # Infinity publish data
-    publish(client, config.MQTT_TOPIC, datasource, config.DELAY)
+    publish(client, config.MQTT_TOPIC, sampler)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import List, Optional
+
+from domain.aggregated_data import AggregatedData
+
+
+class Sampler:
+    """
+    Reads the datasource every interval seconds in its own thread into a
+    preallocated ring buffer, so the sampling rate does not depend on how
+    fast the publisher gets data out. One thread writes and one drains: each
+    side only moves its own counter, so no lock is needed.
+
+    Deadlines are start + n * interval on time.perf_counter(), so sleep jitter
+    does not accumulate. A tick missed by more than a whole interval is
+    skipped and counted, and a sample that finds the buffer full is dropped
+    and counted as an overrun rather than overwriting unsent ones.
+    """
+
+    def __init__(self, datasource, interval: float, capacity: int):
+        self.datasource = datasource
+        self.interval = interval
+        self.capacity = capacity
+        self._buffer: List[Optional[AggregatedData]] = [None] * capacity
+        # Samples ever written and ever drained; only the sampler moves _written, only drain() moves _read
+        self._written = 0
+        self._read = 0
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+
+    def start(self) -> None:
+        self.datasource.startReading()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.datasource.stopReading()
+        self._ready.set()
+
+    def _run(self) -> None:
+        tick = 0
+        started = time.perf_counter()
+        while not self._stopping.is_set():
+            deadline = started + tick * self.interval
+            remaining = deadline - time.perf_counter()
+            if remaining > 0 and self._stopping.wait(remaining):
+                return
+            lateness = time.perf_counter() - deadline
+            if lateness >= self.interval:
+                # Too late for this tick: sample now and realign to the next deadline still ahead
+                skipped = int(lateness / self.interval)
+                self.missed_ticks += skipped
+                tick += skipped
+                lateness -= skipped * self.interval
+            self.lateness_total += lateness
+            self.lateness_max = max(self.lateness_max, lateness)
+            tick += 1
+            self._sample()
+
+    def _sample(self) -> None:
+        data = self.datasource.read()
+        if self._written - self._read >= self.capacity:
+            self.overruns += 1
+        else:
+            self._buffer[self._written % self.capacity] = data
+            self._written += 1
+        self._ready.set()
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> List[AggregatedData]:
+        """
+        Up to max_items buffered samples, oldest first; waits up to timeout
+        seconds (None: until stopped) for the first one if the buffer is empty.
+        """
+        if self._written == self._read:
+            self._ready.clear()
+            # Checked again after clear(): a sample written just before it set the event already
+            if self._written == self._read:
+                self._ready.wait(timeout)
+        end = min(self._written, self._read + max_items)
+        batch = []
+        for index in range(self._read, end):
+            slot = index % self.capacity
+            batch.append(self._buffer[slot])
+            self._buffer[slot] = None
+        self._read = end
+        return batch
+
+    def stats(self) -> dict:
+        ticks = self._written + self.overruns
+        return {
+            "samples": self._written,
+            "buffered": self._written - self._read,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "lateness_mean_ms": self.lateness_total / ticks * 1000 if ticks else 0.0,
+            "lateness_max_ms": self.lateness_max * 1000,
+        }
@@ -0,0 +1,38 @@
+import json
+import math
+
+from domain.aggregated_data import AggregatedData
+
+
+def _int(value) -> str:
+    return "null" if value is None else str(int(value))
+
+
+def _float(value) -> str:
+    if value is None:
+        return "null"
+    value = float(value)
+    # json.dumps writes NaN/Infinity instead of repr's nan/inf
+    return repr(value) if math.isfinite(value) else json.dumps(value)
+
+
+def encode_aggregated_data(data: AggregatedData) -> str:
+    """
+    Hand-specialized AggregatedDataSchema().dumps(data): same fields, order and
+    formatting (json.dumps separators, fields.Number as float, ISO timestamps),
+    so the output is identical byte for byte, without a schema dump per message.
+    """
+    acc = data.accelerometer
+    gps = data.gps
+    accelerometer = "null" if acc is None else (
+        f'{{"x": {_int(acc.x)}, "y": {_int(acc.y)}, "z": {_int(acc.z)}}}'
+    )
+    location = "null" if gps is None else (
+        f'{{"longitude": {_float(gps.longitude)}, "latitude": {_float(gps.latitude)}}}'
+    )
+    timestamp = "null" if data.timestamp is None else f'"{data.timestamp.isoformat()}"'
+    return (
+        f'{{"accelerometer": {accelerometer}, "gps": {location}, '
+        f'"timestamp": {timestamp}, "user_id": {_int(data.user_id)}, '
+        f'"trace": {json.dumps(data.trace)}}}'
+    )
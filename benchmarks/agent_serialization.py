@@ -0,0 +1,85 @@
+"""
+Agent message serialization, messages per second on one core:
+
+  schema_per_message  AggregatedDataSchema().dumps(data)   (previous publish())
+  cached_schema       one AggregatedDataSchema instance
+  fast_encoder        encode_aggregated_data(data)
+
+Before timing, every sample from the agent's CSV files (with and without a
+trace) is checked to encode to the same bytes with all three.
+
+    python benchmarks/agent_serialization.py --messages 100000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "src")
+sys.path.insert(0, AGENT_DIR)
+
+from domain.accelerometer import Accelerometer  # noqa: E402
+from domain.aggregated_data import AggregatedData  # noqa: E402
+from domain.gps import Gps  # noqa: E402
+from file_datasource import FileDatasource  # noqa: E402
+from schema.aggregated_data_encoder import encode_aggregated_data  # noqa: E402
+from schema.aggregated_data_schema import AggregatedDataSchema  # noqa: E402
+
+
+def load_samples():
+    datasource = FileDatasource(
+        os.path.join(AGENT_DIR, "data", "accelerometer.csv"),
+        os.path.join(AGENT_DIR, "data", "gps.csv"),
+    )
+    datasource.startReading()
+    samples = []
+    for i in range(2000):
+        data = datasource.read()
+        if i % 2:
+            data.trace = {"id": uuid.uuid4().hex, "hops": {"agent_publish": time.time()}}
+        samples.append(data)
+    datasource.stopReading()
+    # Edge cases the CSV files do not contain
+    samples.append(AggregatedData(Accelerometer(0, -1, 2), Gps(float("nan"), float("inf")),
+                                  datetime(2024, 1, 1), 7, {"id": "ф", "hops": {}}))
+    samples.append(AggregatedData(Accelerometer(1, 2, 3), Gps(30, 50.0),
+                                  datetime(2024, 1, 1, 0, 0, 0, 1), 1))
+    return samples
+
+
+def check_identical(samples):
+    schema = AggregatedDataSchema()
+    for data in samples:
+        expected = schema.dumps(data)
+        actual = encode_aggregated_data(data)
+        if actual != expected:
+            raise AssertionError(f"Encoder output differs:\n{expected}\n{actual}")
+
+
+def run(name, encode, samples, messages):
+    started = time.perf_counter()
+    for i in range(messages):
+        encode(samples[i % len(samples)])
+    elapsed = time.perf_counter() - started
+    print(f"{name:<20}{messages / elapsed:>14,.0f} msg/s{elapsed / messages * 1e6:>10.2f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    samples = load_samples()
+    check_identical(samples)
+    print(f"Output identical for {len(samples)} samples\n")
+
+    schema = AggregatedDataSchema()
+    run("schema_per_message", lambda data: AggregatedDataSchema().dumps(data), samples, args.messages)
+    run("cached_schema", schema.dumps, samples, args.messages)
+    run("fast_encoder", encode_aggregated_data, samples, args.messages)
+
+
+if __name__ == "__main__":
+    main()
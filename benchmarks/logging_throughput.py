@@ -0,0 +1,120 @@
+"""
+Hub flush path throughput with the old synchronous logging versus the
+queue-based, payload-sampled logging from app/logging_config.py.
+
+Two scenarios per flush of one batch:
+  healthy     old: print(batch)                 new: logging.debug (filtered)
+  store_down  old: error log with full payload  new: error log, payload sampled
+
+    python benchmarks/logging_throughput.py --batches 20000
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+HUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "hub")
+sys.path.insert(0, HUB_DIR)
+
+from app.logging_config import configure_logging, dropped_records, sample_payload, LOG_FORMAT  # noqa: E402
+
+
+def make_batch(size: int) -> str:
+    record = {
+        "road_state": "normal",
+        "agent_data": {
+            "user_id": 1,
+            "accelerometer": {"x": -17.0, "y": 4.0, "z": 16516.0},
+            "gps": {"latitude": 30.524547100067142, "longitude": 50.450386085935094},
+            "timestamp": "2024-03-01T12:00:00.123456",
+        },
+    }
+    return json.dumps([record] * size)
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.close()
+    root.handlers = []
+
+
+def old_healthy(data):
+    print(data)
+
+
+def old_store_down(data):
+    logging.error(f"Invalid Hub response\nData: {data}\nResponse: <Response [500]>")
+
+
+def new_healthy(data):
+    logging.debug(f"Flushing {len(data)} bytes to the Store")
+
+
+def new_store_down(data):
+    logging.error(f"Invalid Store response\nData: {sample_payload(data)}\nResponse: <Response [500]>")
+
+
+def run_old(flush, batches: int, data: str, log_file: str) -> float:
+    """basicConfig with console and file handlers, as edge and hub had"""
+    reset_root()
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[logging.StreamHandler(), logging.FileHandler(log_file)],
+        force=True,
+    )
+    started = time.perf_counter()
+    for _ in range(batches):
+        flush(data)
+    return time.perf_counter() - started
+
+
+def run_new(flush, batches: int, data: str, log_file: str) -> float:
+    reset_root()
+    listener = configure_logging(level=logging.INFO, log_file=log_file)
+    dropped_before = dropped_records.labels().value
+    started = time.perf_counter()
+    for _ in range(batches):
+        flush(data)
+    elapsed = time.perf_counter() - started
+    listener.stop()
+    print(
+        f"  writer thread finished {time.perf_counter() - started - elapsed:.3f}s after the loop, "
+        f"{dropped_records.labels().value - dropped_before:.0f} records dropped",
+        file=sys.__stdout__,
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub logging throughput")
+    parser.add_argument("--batches", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    data = make_batch(args.batch_size)
+    scenarios = {
+        "healthy": (old_healthy, new_healthy),
+        "store_down": (old_store_down, new_store_down),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        console = open(os.path.join(directory, "console.log"), "w")
+        for name, (old, new) in scenarios.items():
+            print(f"{name}:")
+            # Console output goes to a file, as it does under docker
+            with contextlib.redirect_stdout(console), contextlib.redirect_stderr(console):
+                old_rate = args.batches / run_old(old, args.batches, data, os.path.join(directory, "old.log"))
+                new_rate = args.batches / run_new(new, args.batches, data, os.path.join(directory, "new.log"))
+            print(f"  old: {old_rate:10.0f} flushes/s")
+            print(f"  new: {new_rate:10.0f} flushes/s ({new_rate / old_rate:.1f}x)")
+        reset_root()
+        console.close()
+
+
+if __name__ == "__main__":
+    main()
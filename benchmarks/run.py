@@ -0,0 +1,118 @@
+"""
+Pipeline benchmark: agent -> edge -> hub -> store, one stage at a time,
+fully offline (fakeredis, no MQTT broker, SQLite or a local Postgres).
+
+    python benchmarks/run.py                       # all stages, saves results/<time>.json
+    python benchmarks/run.py --stages edge_process hub_batching --quick
+    python benchmarks/run.py --compare benchmarks/results/baseline.json
+
+Each stage runs in its own interpreter from benchmarks/stages/. With
+--compare, a stage whose throughput fell by more than --threshold against the
+baseline is reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES_DIR = os.path.join(BENCH_DIR, "stages")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Stage name -> default iterations, in pipeline order
+STAGES = {
+    "agent_serialize": 20000,
+    "edge_process": 20000,
+    "hub_batching": 20000,
+    "hub_store_payload": 5000,
+    "store_insert": 200,
+}
+
+
+def run_stage(stage: str, iterations: int, python: str) -> Dict:
+    completed = subprocess.run(
+        [python, os.path.join(STAGES_DIR, f"{stage}.py"), "--iterations", str(iterations)],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Stage {stage} failed:\n{completed.stderr}")
+    # The stage prints its result as the last stdout line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: Dict[str, Dict]):
+    print(f"{'stage':<20}{'items/s':>14}{'ops/s':>12}{'p50 us':>11}{'p99 us':>11}")
+    for stage, result in results.items():
+        print(f"{stage:<20}{result['items_per_s']:>14,.0f}{result['ops_per_s']:>12,.0f}"
+              f"{result['p50_us']:>11.1f}{result['p99_us']:>11.1f}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'stage':<20}{'baseline':>14}{'current':>14}{'change':>9}")
+    for stage, result in results.items():
+        if stage not in baseline:
+            continue
+        before, after = baseline[stage]["items_per_s"], result["items_per_s"]
+        change = after / before - 1
+        flag = "  REGRESSION" if change < -threshold else ""
+        print(f"{stage:<20}{before:>14,.0f}{after:>14,.0f}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--quick", action="store_true", help="a tenth of the iterations")
+    parser.add_argument("--python", default=sys.executable,
+                        help="interpreter with the services' requirements installed")
+    parser.add_argument("--output", help="results file (default results/<time>.json)")
+    parser.add_argument("--compare", help="baseline results file to check against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed throughput drop before a stage counts as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for stage in args.stages:
+        iterations = max(1, STAGES[stage] // 10) if args.quick else STAGES[stage]
+        print(f"Running {stage} ({iterations} iterations)...", file=sys.stderr)
+        results[stage] = run_stage(stage, iterations, args.python)
+    print_table(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "stages": results,
+        }, file, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["stages"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared helpers for the pipeline stage benchmarks.
+
+Every stage script runs in its own interpreter (the services reuse module
+names such as `app`, `config` and `main`), measures one operation with
+`measure()` and prints a single JSON line with `emit()` for run.py to collect.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def use_service(name: str, *subdirs: str) -> str:
+    """Put a service directory first on sys.path and make it the cwd"""
+    path = os.path.join(ROOT, name, *subdirs)
+    sys.path.insert(0, path)
+    os.chdir(path)
+    return path
+
+
+def parse_args(default_iterations: int, default_batch: int = 1) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=default_iterations)
+    parser.add_argument("--batch", type=int, default=default_batch)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    return args
+
+
+def sample_records(count: int, user_id: int = 1) -> List[Dict]:
+    """Processed records shaped like the hub and store payloads, deterministic per seed"""
+    started = datetime(2024, 3, 1, 12, 0, 0)
+    records = []
+    for i in range(count):
+        z = 16500 + random.randint(-2000, 2000)
+        records.append({
+            "road_state": random.choice(["normal", "normal", "normal", "pothole", "bump"]),
+            "agent_data": {
+                "user_id": user_id,
+                "accelerometer": {"x": random.randint(-50, 50), "y": random.randint(-50, 50), "z": z},
+                "gps": {
+                    "latitude": 50.45 + random.random() / 100,
+                    "longitude": 30.52 + random.random() / 100,
+                },
+                "timestamp": (started + timedelta(milliseconds=100 * i)).isoformat(),
+                "trace": None,
+            },
+        })
+    return records
+
+
+def measure(operation: Callable[[], None], iterations: int, items_per_op: int = 1,
+            warmup: int = 0) -> Dict:
+    """Time `iterations` calls of `operation`; latencies are per call"""
+    for _ in range(warmup or max(1, iterations // 10)):
+        operation()
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter_ns()
+        operation()
+        timings.append(time.perf_counter_ns() - call_started)
+    return summarize(timings, time.perf_counter() - started, iterations, items_per_op)
+
+
+def measure_async(operation: Callable[[], Awaitable[None]], iterations: int,
+                  items_per_op: int = 1, warmup: int = 0) -> Dict:
+    """measure() for a coroutine function, awaited in sequence on one event loop"""
+    async def run():
+        for _ in range(warmup or max(1, iterations // 10)):
+            await operation()
+        timings = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call_started = time.perf_counter_ns()
+            await operation()
+            timings.append(time.perf_counter_ns() - call_started)
+        return summarize(timings, time.perf_counter() - started, iterations, items_per_op)
+
+    return asyncio.run(run())
+
+
+def summarize(timings: List[int], elapsed: float, iterations: int, items_per_op: int) -> Dict:
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "items_per_op": items_per_op,
+        "elapsed_s": elapsed,
+        "ops_per_s": iterations / elapsed,
+        "items_per_s": iterations * items_per_op / elapsed,
+        "p50_us": timings[len(timings) // 2] / 1000,
+        "p99_us": timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1000,
+    }
+
+
+def emit(stage: str, result: Dict, **extra):
+    print(json.dumps({"stage": stage, **result, **extra}))
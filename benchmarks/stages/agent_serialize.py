@@ -0,0 +1,20 @@
+"""Agent: read a sensor sample and serialize it the way publish() does (config.SERIALIZER)"""
+from _harness import emit, measure, parse_args, use_service
+
+args = parse_args(default_iterations=20000)
+use_service("agent", "src")
+
+from file_datasource import FileDatasource  # noqa: E402
+from main import new_trace, serialize  # noqa: E402
+
+datasource = FileDatasource("data/accelerometer.csv", "data/gps.csv")
+datasource.startReading()
+
+
+def operation():
+    data = datasource.read()
+    data.trace = new_trace()
+    serialize(data)
+
+
+emit("agent_serialize", measure(operation, args.iterations))
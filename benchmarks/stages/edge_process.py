@@ -0,0 +1,24 @@
+"""Edge: validate an agent message and classify the road state"""
+import json
+
+from _harness import emit, measure, parse_args, sample_records, use_service
+
+args = parse_args(default_iterations=20000)
+use_service("edge")
+
+from app.entities.agent_data import AgentData  # noqa: E402
+from app.usecases.data_processing import process_agent_data  # noqa: E402
+
+payloads = [json.dumps(record["agent_data"]) for record in sample_records(1000)]
+position = 0
+
+
+def operation():
+    global position
+    payload = payloads[position % len(payloads)]
+    position += 1
+    agent_data = AgentData.model_validate_json(payload, strict=True)
+    process_agent_data(agent_data).model_dump_json()
+
+
+emit("edge_process", measure(operation, args.iterations))
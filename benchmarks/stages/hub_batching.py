@@ -0,0 +1,60 @@
+"""
+Hub: enqueue validated records into Redis and flush full batches.
+
+Uses fakeredis unless BENCH_REDIS_URL points at a real (disposable) Redis;
+QUEUE_MODE selects the list or stream queue as in the hub.
+The Store is replaced by a gateway that only counts records, so only the
+hub's own queueing work is measured.
+"""
+import json
+import os
+
+from _harness import emit, measure_async, parse_args, sample_records, use_service
+
+args = parse_args(default_iterations=20000)
+use_service("hub")
+os.environ["LOG_FILE"] = ""
+
+import main  # noqa: E402
+from app.entities.processed_agent_data import ProcessedAgentData  # noqa: E402
+from app.interfaces.store_gateway import StoreGateway  # noqa: E402
+
+
+class CountingStore(StoreGateway):
+    def __init__(self):
+        self.saved = 0
+
+    async def save_data(self, processed_agent_data_batch):
+        self.saved += len(processed_agent_data_batch)
+        return True
+
+    async def save_raw_data(self, json_records, flush_time=None):
+        self.saved += len(json_records)
+        return True
+
+
+if os.environ.get("BENCH_REDIS_URL"):
+    from redis.asyncio import Redis
+    main.redis_client = Redis.from_url(os.environ["BENCH_REDIS_URL"])
+else:
+    import fakeredis
+    main.redis_client = fakeredis.FakeAsyncRedis()
+main.queue.redis_client = main.redis_client
+main.store_adapter = CountingStore()
+
+payloads = [json.dumps(record).encode() for record in sample_records(1000)]
+records = [(ProcessedAgentData.model_validate_json(payload), payload) for payload in payloads]
+position = 0
+
+
+async def operation():
+    global position
+    if position == 0:
+        await main.redis_client.delete("processed_agent_data", main.QUEUE_STREAM)
+    processed_agent_data, payload = records[position % len(records)]
+    await main.enqueue([(processed_agent_data, payload)], "bench")
+    position += 1
+
+
+emit("hub_batching", measure_async(operation, args.iterations), batch_size=main.BATCH_SIZE,
+     queue=main.QUEUE_MODE, redis="real" if os.environ.get("BENCH_REDIS_URL") else "fakeredis")
@@ -0,0 +1,14 @@
+"""Hub: build the JSON body StoreApiAdapter posts for one batch"""
+import json
+
+from _harness import emit, measure, parse_args, sample_records, use_service
+
+args = parse_args(default_iterations=5000, default_batch=20)
+use_service("hub")
+
+from app.adapters.store_api_adapter import StoreApiAdapter  # noqa: E402
+
+batch = [json.dumps(record).encode() for record in sample_records(args.batch)]
+
+emit("hub_store_payload",
+     measure(lambda: StoreApiAdapter.build_payload(batch), args.iterations, items_per_op=args.batch))
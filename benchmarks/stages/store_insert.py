@@ -0,0 +1,47 @@
+"""
+Store: bulk insert one hub batch through the POST /processed_agent_data/ handler.
+
+Runs against a throwaway SQLite file unless BENCH_DATABASE_URL points at a
+local (disposable) Postgres, where the partitioned schema is exercised too.
+"""
+import asyncio
+import os
+import tempfile
+
+from _harness import emit, measure, parse_args, sample_records, use_service
+
+args = parse_args(default_iterations=200, default_batch=100)
+use_service("store")
+database_file = None
+if os.environ.get("BENCH_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+else:
+    database_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_file}"
+os.environ["LOG_FILE"] = ""
+# One client at a time: waiting for others to group with would only add the delay
+os.environ["INGEST_COMMIT_DELAY_MS"] = "0"
+
+import main  # noqa: E402
+from models.modelsFastAPI import ProcessedAgentData  # noqa: E402
+
+# Unique timestamps per batch, including the warmup batches
+batch_count = args.iterations + max(1, args.iterations // 10)
+records = [ProcessedAgentData.model_validate(record)
+           for record in sample_records(batch_count * args.batch)]
+batches = iter([records[i:i + args.batch] for i in range(0, len(records), args.batch)])
+loop = asyncio.new_event_loop()
+
+
+def operation():
+    loop.run_until_complete(main.create_processed_agent_data(next(batches)))
+
+
+try:
+    emit("store_insert", measure(operation, args.iterations, items_per_op=args.batch),
+         database=main.engine.dialect.name)
+finally:
+    loop.close()
+    main.engine.dispose()
+    if database_file:
+        os.unlink(database_file)
@@ -0,0 +1,84 @@
+"""
+Store ingest with one transaction per POST versus group commit.
+
+Concurrent clients each send small batches through the POST handler's insert
+path; the table compares rows/s with commits/s, the rows per transaction and
+the request latency for group commit off and at a few delays.
+
+    python benchmarks/store_group_commit.py --clients 32 --requests 50 --batch 10
+    BENCH_DATABASE_URL=postgresql+psycopg2://... python benchmarks/store_group_commit.py
+
+Without BENCH_DATABASE_URL a temporary SQLite file is used, where commits are
+serialized by the database file lock anyway; the commit cost that group
+commit saves shows best on Postgres. Point it at a disposable database only.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "stages"))
+
+from _harness import sample_records, use_service  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--clients", type=int, default=32)
+parser.add_argument("--requests", type=int, default=50, help="requests per client")
+parser.add_argument("--batch", type=int, default=10, help="rows per request")
+parser.add_argument("--delays", type=float, nargs="+", default=[1, 5, 20], help="group commit delays in ms")
+args = parser.parse_args()
+
+use_service("store")
+database_file = None
+if os.environ.get("BENCH_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+else:
+    database_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_file}"
+os.environ["LOG_FILE"] = ""
+
+import main  # noqa: E402
+from models.modelsFastAPI import ProcessedAgentData  # noqa: E402
+
+modes = [("off", 0.0, 0)] + [(f"{delay:g} ms", delay / 1000, 5000) for delay in args.delays]
+per_mode = args.clients * args.requests * args.batch
+# Unique timestamps across all modes
+records = [ProcessedAgentData.model_validate(record) for record in sample_records(per_mode * len(modes))]
+
+
+async def run_clients(batches):
+    latencies = []
+
+    async def client(own):
+        for batch in own:
+            started = time.perf_counter()
+            await main.create_processed_agent_data(batch)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client(batches[i::args.clients]) for i in range(args.clients)))
+    await main.ingest.stop()
+    return sorted(latencies)
+
+
+print(f"{args.clients} clients x {args.requests} requests x {args.batch} rows, "
+      f"{main.engine.dialect.name}")
+print(f"{'group commit':<14}{'rows/s':>10}{'commits/s':>11}{'rows/commit':>13}{'p50 ms':>9}{'p99 ms':>9}")
+try:
+    for index, (name, delay, max_rows) in enumerate(modes):
+        main.ingest.max_delay, main.ingest.max_rows = delay, max_rows
+        rows = records[index * per_mode:(index + 1) * per_mode]
+        batches = [rows[i:i + args.batch] for i in range(0, len(rows), args.batch)]
+        commits_before = main.insert_duration.labels().count
+        started = time.perf_counter()
+        latencies = asyncio.run(run_clients(batches))
+        elapsed = time.perf_counter() - started
+        commits = main.insert_duration.labels().count - commits_before
+        print(f"{name:<14}{len(rows) / elapsed:>10,.0f}{commits / elapsed:>11,.0f}"
+              f"{len(rows) / commits:>13,.1f}{latencies[len(latencies) // 2] * 1000:>9.1f}"
+              f"{latencies[int(len(latencies) * 0.99)] * 1000:>9.1f}")
+finally:
+    main.engine.dispose()
+    if database_file:
+        os.unlink(database_file)
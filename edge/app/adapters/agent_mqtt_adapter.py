@@ -1,9 +1,17 @@
 import logging
+import time
 import paho.mqtt.client as mqtt
 from app.interfaces.agent_gateway import AgentGateway
 from app.entities.agent_data import AgentData, GpsData
 from app.usecases.data_processing import process_agent_data
 from app.interfaces.hub_gateway import HubGateway
+from app.tracing import record_hop
+from app.metrics import Counter, Histogram
+
+messages_in = Counter("edge_messages_in_total", "Agent messages received")
+messages_out = Counter("edge_messages_out_total", "Processed records sent to the Hub", ["result"])
+road_states = Counter("edge_road_state_total", "Classified records per road state", ["road_state"])
+processing_duration = Histogram("edge_processing_seconds", "Time to validate and classify one message")
 
 
 class AgentMQTTAdapter(AgentGateway):
@@ -33,14 +41,24 @@ class AgentMQTTAdapter(AgentGateway):
 
     def on_message(self, client, userdata, msg):
         """Processing agent data and sent it to hub gateway"""
+        messages_in.inc()
         try:
+            started = time.perf_counter()
             payload: str = msg.payload.decode("utf-8")
             # Create AgentData instance with the received data
             agent_data = AgentData.model_validate_json(payload, strict=True)
+            record_hop(agent_data.trace, "edge_receive")
             # Process the received data (you can call a use case here if needed)
             processed_data = process_agent_data(agent_data)
+            record_hop(agent_data.trace, "edge_classify")
+            processing_duration.observe(time.perf_counter() - started)
+            road_states.labels(processed_data.road_state).inc()
+            record_hop(agent_data.trace, "edge_forward")
             # Store the agent_data in the database (you can send it to the data processing module)
-            if not self.hub_gateway.save_data(processed_data):
+            if self.hub_gateway.save_data(processed_data):
+                messages_out.labels("ok").inc()
+            else:
+                messages_out.labels("failed").inc()
                 logging.error("Hub is not available")
         except Exception as e:
             logging.info(f"Error processing MQTT message: {e}")
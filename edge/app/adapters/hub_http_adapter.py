@@ -4,6 +4,7 @@ import requests as requests
 
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
+from app.logging_config import sample_payload
 
 
 class HubHttpAdapter(HubGateway):
@@ -23,7 +24,7 @@ class HubHttpAdapter(HubGateway):
         response = requests.post(url, data=processed_data.model_dump_json())
         if response.status_code != 200:
             logging.info(
-                f"Invalid Hub response\nData: {processed_data.model_dump_json()}\nResponse: {response}"
+                f"Invalid Hub response\nData: {sample_payload(processed_data.model_dump_json)}\nResponse: {response}"
             )
             return False
         return True
@@ -28,19 +28,19 @@ class HubMqttAdapter(HubGateway):
         if status == 0:
             return True
         else:
-            print(f"Failed to send message to topic {self.topic}")
+            logging.error(f"Failed to send message to topic {self.topic}")
             return False
 
     @staticmethod
     def _connect_mqtt(broker, port):
         """Create MQTT client"""
-        print(f"CONNECT TO {broker}:{port}")
+        logging.info(f"Connecting to {broker}:{port}")
 
         def on_connect(client, userdata, flags, rc):
             if rc == 0:
-                print(f"Connected to MQTT Broker ({broker}:{port})!")
+                logging.info(f"Connected to MQTT Broker ({broker}:{port})!")
             else:
-                print("Failed to connect {broker}:{port}, return code %d\n", rc)
+                logging.error(f"Failed to connect {broker}:{port}, return code {rc}")
                 exit(rc)  # Stop execution
 
         client = mqtt_client.Client()
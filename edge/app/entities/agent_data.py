@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Dict, Optional
 from pydantic import BaseModel, field_validator
 
 
@@ -13,10 +14,18 @@ class GpsData(BaseModel):
     longitude: float
 
 
+class Trace(BaseModel):
+    id: str
+    # Stage name -> unix time the message passed it, in hop order
+    hops: Dict[str, float]
+
+
 class AgentData(BaseModel):
+    user_id: int
     accelerometer: AccelerometerData
     gps: GpsData
     timestamp: datetime
+    trace: Optional[Trace] = None
 
     @classmethod
     @field_validator("timestamp", mode="before")
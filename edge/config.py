@@ -22,3 +22,20 @@ HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "processed_agent_data_topic
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 8000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+
+# Seconds between hop latency reports in the log
+TRACE_REPORT_INTERVAL = try_parse_int(os.environ.get("TRACE_REPORT_INTERVAL")) or 60
+
+# Port of the Prometheus-style /metrics endpoint, 0 disables it
+METRICS_PORT = try_parse_int(os.environ.get("METRICS_PORT"))
+if METRICS_PORT is None:
+    METRICS_PORT = 9100
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")  # Empty disables the log file
+# Records waiting for the log writer thread; more are dropped, not waited on
+LOG_QUEUE_SIZE = try_parse_int(os.environ.get("LOG_QUEUE_SIZE")) or 10000
+# Full payloads allowed into the log per second, 0 disables payload logging
+LOG_PAYLOAD_RATE = float(os.environ.get("LOG_PAYLOAD_RATE") or 1)
+LOG_PAYLOAD_MAX_CHARS = try_parse_int(os.environ.get("LOG_PAYLOAD_MAX_CHARS")) or 1000
@@ -1,7 +1,11 @@
 import logging
+import time
 from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
 from app.adapters.hub_http_adapter import HubHttpAdapter
 from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.logging_config import configure_logging
+from app.metrics import start_http_server
+from app.tracing import latency_report
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
@@ -10,18 +14,15 @@ from config import (
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
+    TRACE_REPORT_INTERVAL,
+    METRICS_PORT,
 )
 
 if __name__ == "__main__":
-    # Configure logging settings
-    logging.basicConfig(
-        level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-        format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-        handlers=[
-            logging.StreamHandler(),  # Output log messages to the console
-            logging.FileHandler("app.log"),  # Save log messages to a file
-        ],
-    )
+    # Configure logging settings (LOG_* variables in config.py)
+    configure_logging()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
     # Create an instance of the StoreApiAdapter using the configuration
     # hub_adapter = HubHttpAdapter(
     #     api_base_url=HUB_URL,
@@ -42,9 +43,10 @@ if __name__ == "__main__":
         # Connect to the MQTT broker and start listening for messages
         agent_adapter.connect()
         agent_adapter.start()
-        # Keep the system running indefinitely (you can add other logic as needed)
+        # Keep the system running indefinitely, reporting hop latencies
         while True:
-            pass
+            time.sleep(TRACE_REPORT_INTERVAL)
+            logging.info(f"Hop latencies: {latency_report()}")
     except KeyboardInterrupt:
         # Stop the MQTT adapter and exit gracefully if interrupted by the user
         agent_adapter.stop()
@@ -0,0 +1,63 @@
+from typing import Dict, List
+
+from redis.asyncio import Redis
+
+from app.interfaces.queue_gateway import QueueEntry, QueueGateway
+
+
+class RedisListQueueAdapter(QueueGateway):
+    """
+    Redis list queue. Records of a failed Store request are pushed back, up
+    to max_deliveries attempts counted by this worker, but records popped by a
+    hub that dies before the Store answers are lost; use
+    RedisStreamQueueAdapter for at-least-once delivery.
+    """
+
+    def __init__(self, redis_client: Redis, key: str, dead_letter_key: str,
+                 max_deliveries: int, dead_letter_maxlen: int):
+        self.redis_client = redis_client
+        self.key = key
+        self.dead_letter_key = dead_letter_key
+        self.max_deliveries = max_deliveries
+        self.dead_letter_maxlen = dead_letter_maxlen
+        # Failed deliveries per record still in the queue; kept by this worker only
+        self._failures: Dict[bytes, int] = {}
+
+    async def push(self, records: List[bytes]) -> int:
+        return await self.redis_client.lpush(self.key, *records)
+
+    async def pop_batch(self, count: int) -> List[QueueEntry]:
+        records = await self.redis_client.lpop(self.key, count) or []
+        return [(None, record) for record in records]
+
+    async def ack(self, entries: List[QueueEntry]) -> None:
+        for _, record in entries:
+            self._failures.pop(record, None)
+
+    async def release(self, entries: List[QueueEntry]) -> int:
+        retry, dead = [], []
+        for entry in entries:
+            failures = self._failures.get(entry[1], 0) + 1
+            if failures >= self.max_deliveries:
+                dead.append(entry)
+            else:
+                self._failures[entry[1]] = failures
+                retry.append(entry)
+        if retry:
+            # Back at the head, in the order they were popped
+            await self.redis_client.lpush(self.key, *(record for _, record in reversed(retry)))
+        await self.dead_letter(dead)
+        return len(dead)
+
+    async def dead_letter(self, entries: List[QueueEntry]) -> None:
+        if not entries:
+            return
+        for _, record in entries:
+            self._failures.pop(record, None)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.rpush(self.dead_letter_key, *(record for _, record in entries))
+            pipe.ltrim(self.dead_letter_key, -self.dead_letter_maxlen, -1)
+            await pipe.execute()
+
+    async def depth(self) -> int:
+        return await self.redis_client.llen(self.key)
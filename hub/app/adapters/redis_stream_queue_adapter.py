@@ -0,0 +1,123 @@
+import logging
+import time
+from typing import List
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.interfaces.queue_gateway import QueueEntry, QueueGateway
+
+
+class RedisStreamQueueAdapter(QueueGateway):
+    """
+    Redis Streams queue shared by all hub workers through one consumer group.
+    Records stay pending until acknowledged; records a worker failed to save
+    or left behind when it died are claimed by another pop after claim_idle
+    seconds, so delivery is at least once. A record that failed
+    max_deliveries times (XPENDING's delivery count) goes to the dead-letter
+    list. The stream is capped at about maxlen records, the oldest are
+    trimmed even if not yet saved.
+    """
+
+    def __init__(self, redis_client: Redis, stream: str, group: str, consumer: str,
+                 maxlen: int, claim_idle: float, dead_letter_key: str, max_deliveries: int):
+        self.redis_client = redis_client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.claim_idle = claim_idle
+        self.dead_letter_key = dead_letter_key
+        self.max_deliveries = max_deliveries
+        self._group_ready = False
+        self._claim_cursor = "0-0"
+        self._last_claim = 0.0
+
+    async def push(self, records: List[bytes]) -> int:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for record in records:
+                pipe.xadd(self.stream, {"data": record}, maxlen=self.maxlen, approximate=True)
+            pipe.xlen(self.stream)
+            *_, length = await pipe.execute()
+        return length
+
+    async def pop_batch(self, count: int) -> List[QueueEntry]:
+        try:
+            return await self._pop_batch(count)
+        except ResponseError as e:
+            if "NOGROUP" not in str(e):
+                raise
+            # The stream was deleted together with the group
+            self._group_ready = False
+            return await self._pop_batch(count)
+
+    async def _pop_batch(self, count: int) -> List[QueueEntry]:
+        await self._ensure_group()
+        entries = []
+        if time.monotonic() - self._last_claim >= self.claim_idle:
+            self._last_claim = time.monotonic()
+            self._claim_cursor, claimed, *_ = await self.redis_client.xautoclaim(
+                self.stream, self.group, self.consumer,
+                min_idle_time=int(self.claim_idle * 1000),
+                start_id=self._claim_cursor, count=count,
+            )
+            if claimed:
+                logging.info(f"Reclaimed {len(claimed)} unacknowledged records")
+            entries.extend(claimed)
+        if len(entries) < count:
+            response = await self.redis_client.xreadgroup(
+                self.group, self.consumer, {self.stream: ">"}, count=count - len(entries)
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+        # Entries trimmed while pending come back without fields
+        return [(entry_id, fields[b"data"]) for entry_id, fields in entries if fields]
+
+    async def ack(self, entries: List[QueueEntry]) -> None:
+        entry_ids = [entry_id for entry_id, _ in entries]
+        if not entry_ids:
+            return
+        # Deleting acknowledged entries keeps XLEN equal to the backlog
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            await pipe.execute()
+
+    async def release(self, entries: List[QueueEntry]) -> int:
+        if not entries:
+            return 0
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for entry_id, _ in entries:
+                pipe.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+            pending = await pipe.execute()
+        dead = [
+            entry for entry, info in zip(entries, pending)
+            if info and info[0]["times_delivered"] >= self.max_deliveries
+        ]
+        # The others stay pending and are claimed again after claim_idle
+        await self.dead_letter(dead)
+        return len(dead)
+
+    async def dead_letter(self, entries: List[QueueEntry]) -> None:
+        if not entries:
+            return
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.rpush(self.dead_letter_key, *(record for _, record in entries))
+            pipe.ltrim(self.dead_letter_key, -self.maxlen, -1)
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            await pipe.execute()
+
+    async def depth(self) -> int:
+        return await self.redis_client.xlen(self.stream)
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
@@ -2,18 +2,21 @@ import json
 import logging
 from typing import List
 
+import httpx
 import pydantic_core
-import requests
 
 from app.entities.processed_agent_data import ProcessedAgentData
-from app.interfaces.store_gateway import StoreGateway
+from app.interfaces.store_gateway import SaveResult, StoreGateway
+from app.logging_config import sample_payload
 
 
 class StoreApiAdapter(StoreGateway):
     def __init__(self, api_base_url):
         self.api_base_url = api_base_url
+        # Keeps connections to the Store open between batches
+        self.client = httpx.AsyncClient()
 
-    def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
         """
         Save the processed road data to the Store API.
         Parameters:
@@ -21,19 +24,45 @@ class StoreApiAdapter(StoreGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        # Implement it
+        json_records = [item.model_dump_json().encode() for item in processed_agent_data_batch]
+        return await self.save_raw_data(json_records) is SaveResult.SAVED
+
+    async def save_raw_data(self, json_records: List[bytes], flush_time: float = None):
+        """
+        Send validated records to the Store API as they were received.
+        Parameters:
+            json_records (List[bytes]): JSON documents of ProcessedAgentData.
+            flush_time (float): Unix time the batch left the queue.
+        Returns:
+            SaveResult: SAVED on 200; RETRY on 5xx, 408, 429 and connection
+            errors or timeouts; REJECTED on any other status (e.g. 422).
+        """
         url = f"{self.api_base_url}/processed_agent_data/"
-        json_strings = [item.model_dump_json() for item in processed_agent_data_batch]
-        data = f'[{",".join(json_strings)}]'
+        data = self.build_payload(json_records)
 
         headers = {'Content-Type': 'application/json'}
+        if flush_time is not None:
+            # The Store records the hub_flush hop of traced records from it
+            headers['X-Hub-Flush-Time'] = repr(flush_time)
 
         try:
-            with requests.post(url, data=data, headers=headers) as response:
-                if response.status_code != 200:
-                    logging.error(f"Invalid Hub response\nData: {data}\nResponse: {response}")
-                    return False
+            response = await self.client.post(url, content=data, headers=headers)
         except Exception as e:
             logging.error(f"Error occurred during request: {e}")
-            return False
-        return True
\ No newline at end of file
+            return SaveResult.RETRY
+        if response.status_code == 200:
+            return SaveResult.SAVED
+        logging.error(
+            f"Invalid Store response\nData: {sample_payload(data.decode)}\nResponse: {response}"
+        )
+        if response.status_code >= 500 or response.status_code in (408, 429):
+            return SaveResult.RETRY
+        return SaveResult.REJECTED
+
+    async def close(self):
+        await self.client.aclose()
+
+    @staticmethod
+    def build_payload(json_records: List[bytes]) -> bytes:
+        """JSON array body for the Store's bulk insert endpoint, without re-parsing the records"""
+        return b"[" + b",".join(json_records) + b"]"
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from typing import Optional
+
+
+class AdmissionControl:
+    """
+    Hysteresis on the queue depth: new records are refused once the depth
+    reaches the high watermark and accepted again at or below the low one,
+    so a Store outage bounds the queue instead of growing Redis memory.
+    """
+
+    def __init__(self, high_watermark: int, low_watermark: int):
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+        self.depth = 0
+        self.admitting = True
+        self._resumed: Optional[asyncio.Event] = None
+
+    def update(self, depth: int) -> None:
+        self.depth = depth
+        if self.admitting and depth >= self.high_watermark:
+            self.admitting = False
+            logging.warning(f"Queue depth {depth} reached the high watermark, refusing new records")
+        elif not self.admitting and depth <= self.low_watermark:
+            self.admitting = True
+            logging.warning(f"Queue depth {depth} is back at the low watermark, accepting records")
+            if self._resumed is not None:
+                self._resumed.set()
+
+    async def wait(self) -> None:
+        """Return once records are admitted"""
+        while not self.admitting:
+            # Created here so that it belongs to the running loop
+            if self._resumed is None or self._resumed.is_set():
+                self._resumed = asyncio.Event()
+            await self._resumed.wait()
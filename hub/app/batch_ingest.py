@@ -0,0 +1,67 @@
+import zlib
+from typing import List, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.entities.processed_agent_data import ProcessedAgentData
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+processed_agent_data_list = TypeAdapter(List[ProcessedAgentData])
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+class InvalidBatch(ValueError):
+    """Validation errors of all invalid records, located by record index"""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} validation errors")
+        self.errors = errors
+
+
+def decode_body(body: bytes, content_encoding: str, max_bytes: int) -> bytes:
+    """Undo gzip Content-Encoding, refusing bodies that inflate past max_bytes"""
+    if content_encoding.strip().lower() not in ("gzip", "x-gzip"):
+        if len(body) > max_bytes:
+            raise BatchTooLarge(f"Body exceeds {max_bytes} bytes")
+        return body
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        decoded = decompressor.decompress(body, max_bytes + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}")
+    if len(decoded) > max_bytes or decompressor.unconsumed_tail:
+        raise BatchTooLarge(f"Decompressed body exceeds {max_bytes} bytes")
+    return decoded
+
+
+def parse_batch(body: bytes, content_type: str) -> List[Tuple[ProcessedAgentData, bytes]]:
+    """
+    Validate a JSON array or NDJSON body of records; returns each record with
+    the JSON to queue. NDJSON lines are queued as received, array elements are
+    serialized once after validation. Raises InvalidBatch if any record is invalid.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type not in NDJSON_TYPES:
+        try:
+            items = processed_agent_data_list.validate_json(body)
+        except ValidationError as e:
+            raise InvalidBatch(e.errors(include_url=False))
+        return [(item, item.model_dump_json().encode()) for item in items]
+
+    records = []
+    errors: List[dict] = []
+    # One record per line; a line is validated alone so it can be forwarded as is
+    lines = (line.strip() for line in body.split(b"\n"))
+    for index, line in enumerate(line for line in lines if line):
+        try:
+            records.append((ProcessedAgentData.model_validate_json(line), line))
+        except ValidationError as e:
+            errors.extend({**error, "loc": (index, *error["loc"])}
+                          for error in e.errors(include_url=False))
+    if errors:
+        raise InvalidBatch(errors)
+    return records
@@ -0,0 +1,76 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+# (entry id, JSON record); the id is None for queues without acknowledgment
+QueueEntry = Tuple[Optional[bytes], bytes]
+
+
+class QueueGateway(ABC):
+    """
+    Abstract class representing the queue between receiving and flushing records.
+    All queue adapters must implement these methods.
+    """
+
+    @abstractmethod
+    async def push(self, records: List[bytes]) -> int:
+        """
+        Method to append validated records to the queue in one round trip.
+        Parameters:
+            records (List[bytes]): JSON documents of ProcessedAgentData.
+        Returns:
+            int: Records in the queue after the push, for the batch trigger.
+        """
+        pass
+
+    @abstractmethod
+    async def pop_batch(self, count: int) -> List[QueueEntry]:
+        """
+        Method to take up to count records for one Store batch.
+        Parameters:
+            count (int): Maximum number of records.
+        Returns:
+            List[QueueEntry]: Entry ids and records, empty if the queue is drained.
+        """
+        pass
+
+    @abstractmethod
+    async def ack(self, entries: List[QueueEntry]) -> None:
+        """
+        Method to confirm that popped records were saved. Records that are never
+        acknowledged are delivered again by queues that support it.
+        Parameters:
+            entries (List[QueueEntry]): Entries returned by pop_batch.
+        """
+        pass
+
+    @abstractmethod
+    async def release(self, entries: List[QueueEntry]) -> int:
+        """
+        Method to give back popped records the Store failed to save, so they are
+        retried and keep counting towards the queue depth. Records delivered
+        the maximum number of times are moved to the dead-letter list instead.
+        Parameters:
+            entries (List[QueueEntry]): Entries returned by pop_batch.
+        Returns:
+            int: Records moved to the dead-letter list.
+        """
+        pass
+
+    @abstractmethod
+    async def dead_letter(self, entries: List[QueueEntry]) -> None:
+        """
+        Method to move popped records the Store rejected out of the queue,
+        onto the dead-letter list where they can be inspected and replayed.
+        Parameters:
+            entries (List[QueueEntry]): Entries returned by pop_batch.
+        """
+        pass
+
+    @abstractmethod
+    async def depth(self) -> int:
+        """
+        Method to count the records waiting in the queue.
+        Returns:
+            int: Records not yet saved to the Store.
+        """
+        pass
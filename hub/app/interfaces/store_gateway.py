@@ -1,8 +1,18 @@
 from abc import ABC, abstractmethod
+from enum import Enum
 from typing import List
 from app.entities.processed_agent_data import ProcessedAgentData
 
 
+class SaveResult(Enum):
+    """Outcome of sending a batch to the Store"""
+    SAVED = "saved"
+    # The Store was unreachable or failed; the same batch may succeed later
+    RETRY = "retry"
+    # The Store refused the records; sending them again gets the same answer
+    REJECTED = "rejected"
+
+
 class StoreGateway(ABC):
     """
     Abstract class representing the Store Gateway interface.
@@ -10,7 +20,7 @@ class StoreGateway(ABC):
     """
 
     @abstractmethod
-    def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
         """
         Method to save the processed agent data in the database.
         Parameters:
@@ -19,3 +29,19 @@ class StoreGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    @abstractmethod
+    async def save_raw_data(self, json_records: List[bytes], flush_time: float = None) -> SaveResult:
+        """
+        Method to save already validated records without re-serializing them.
+        Parameters:
+            json_records (List[bytes]): JSON documents of ProcessedAgentData, as validated on receive.
+            flush_time (float): Unix time the batch left the queue, forwarded for latency traces.
+        Returns:
+            SaveResult: SAVED, RETRY for failures worth retrying, REJECTED otherwise.
+        """
+        pass
+
+    async def close(self) -> None:
+        """Release connections held by the adapter"""
+        pass
@@ -1,4 +1,5 @@
 import os
+import socket
 
 
 def try_parse_int(value: str):
@@ -19,8 +20,49 @@ REDIS_PORT = try_parse_int(os.environ.get("REDIS_PORT")) or 6379
 
 # Configure for hub logic
 BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 20
+# Seconds after which waiting records are flushed even if fewer than BATCH_SIZE
+QUEUE_FLUSH_INTERVAL = try_parse_int(os.environ.get("QUEUE_FLUSH_INTERVAL")) or 5
+
+# Largest (decompressed) body of a batch request
+BATCH_MAX_BYTES = try_parse_int(os.environ.get("BATCH_MAX_BYTES")) or 16 * 1024 * 1024
+
+# Backpressure: stop accepting records at the high queue depth, resume at the low one
+QUEUE_HIGH_WATERMARK = try_parse_int(os.environ.get("QUEUE_HIGH_WATERMARK")) or 10000
+QUEUE_LOW_WATERMARK = try_parse_int(os.environ.get("QUEUE_LOW_WATERMARK")) or 5000
+# Retry-After seconds sent with refused requests
+QUEUE_RETRY_AFTER = try_parse_int(os.environ.get("QUEUE_RETRY_AFTER")) or 5
+
+# Queue: "list" (Redis list, no acknowledgment) or "stream" (Redis Streams consumer group)
+QUEUE_MODE = os.environ.get("QUEUE_MODE") or "list"
+QUEUE_STREAM = os.environ.get("QUEUE_STREAM") or "processed_agent_data_stream"
+QUEUE_GROUP = os.environ.get("QUEUE_GROUP") or "hub"
+# Unique per hub worker
+QUEUE_CONSUMER = os.environ.get("QUEUE_CONSUMER") or f"{socket.gethostname()}-{os.getpid()}"
+# Approximate cap on the stream length, the oldest records are trimmed
+QUEUE_MAXLEN = try_parse_int(os.environ.get("QUEUE_MAXLEN")) or 100000
+# Seconds a popped record may stay unacknowledged before another worker claims it
+QUEUE_CLAIM_IDLE = try_parse_int(os.environ.get("QUEUE_CLAIM_IDLE")) or 30
+# Deliveries to the Store after which a failing record is moved to the dead-letter list
+QUEUE_MAX_DELIVERIES = try_parse_int(os.environ.get("QUEUE_MAX_DELIVERIES")) or 20
+# Redis list of records the Store rejected or that failed QUEUE_MAX_DELIVERIES times,
+# capped at QUEUE_MAXLEN records
+QUEUE_DEAD_LETTER = os.environ.get("QUEUE_DEAD_LETTER") or "processed_agent_data_dead"
 
 # MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "processed_agent_data_topic"
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")  # Empty disables the log file
+# Records waiting for the log writer thread; more are dropped, not waited on
+LOG_QUEUE_SIZE = try_parse_int(os.environ.get("LOG_QUEUE_SIZE")) or 10000
+# Full payloads allowed into the log per second, 0 disables payload logging
+LOG_PAYLOAD_RATE = float(os.environ.get("LOG_PAYLOAD_RATE") or 1)
+LOG_PAYLOAD_MAX_CHARS = try_parse_int(os.environ.get("LOG_PAYLOAD_MAX_CHARS")) or 1000
+
+# MQTT consumer: messages handled concurrently (and buffered while paused, the
+# rest are dropped), seconds between reconnect attempts
+MQTT_MAX_IN_FLIGHT = try_parse_int(os.environ.get("MQTT_MAX_IN_FLIGHT")) or 1000
+MQTT_RECONNECT_INTERVAL = try_parse_int(os.environ.get("MQTT_RECONNECT_INTERVAL")) or 5
@@ -1,96 +1,301 @@
+import asyncio
 import logging
-from typing import List
+import time
+from contextlib import asynccontextmanager
+from typing import List, Set, Tuple
 
-from fastapi import FastAPI
-from redis import Redis
-import paho.mqtt.client as mqtt
+import aiomqtt
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
+from redis.asyncio import Redis
 
+from app.admission import AdmissionControl
+from app.batch_ingest import BatchTooLarge, InvalidBatch, decode_body, parse_batch
+from app.adapters.redis_list_queue_adapter import RedisListQueueAdapter
+from app.adapters.redis_stream_queue_adapter import RedisStreamQueueAdapter
 from app.adapters.store_api_adapter import StoreApiAdapter
+from app.interfaces.store_gateway import SaveResult
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.logging_config import configure_logging
+from app.metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, render
+from app.tracing import record_hop, latency_report
 from config import (
     STORE_API_BASE_URL,
     REDIS_HOST,
     REDIS_PORT,
     BATCH_SIZE,
+    BATCH_MAX_BYTES,
+    QUEUE_FLUSH_INTERVAL,
+    QUEUE_HIGH_WATERMARK,
+    QUEUE_LOW_WATERMARK,
+    QUEUE_RETRY_AFTER,
+    QUEUE_MODE,
+    QUEUE_STREAM,
+    QUEUE_GROUP,
+    QUEUE_CONSUMER,
+    QUEUE_MAXLEN,
+    QUEUE_CLAIM_IDLE,
+    QUEUE_MAX_DELIVERIES,
+    QUEUE_DEAD_LETTER,
     MQTT_TOPIC,
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
+    MQTT_MAX_IN_FLIGHT,
+    MQTT_RECONNECT_INTERVAL,
 )
 
-# Configure logging settings
-logging.basicConfig(
-    level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-    format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # Output log messages to the console
-        logging.FileHandler("app.log"),  # Save log messages to a file
-    ],
-)
+# Configure logging settings (LOG_* variables in config.py)
+configure_logging()
 # Create an instance of the Redis using the configuration
 redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+# Create the queue between receiving and flushing records (QUEUE_MODE)
+if QUEUE_MODE == "stream":
+    queue = RedisStreamQueueAdapter(
+        redis_client, QUEUE_STREAM, QUEUE_GROUP, QUEUE_CONSUMER, QUEUE_MAXLEN, QUEUE_CLAIM_IDLE,
+        QUEUE_DEAD_LETTER, QUEUE_MAX_DELIVERIES,
+    )
+else:
+    queue = RedisListQueueAdapter(
+        redis_client, "processed_agent_data", QUEUE_DEAD_LETTER, QUEUE_MAX_DELIVERIES, QUEUE_MAXLEN
+    )
+# Refuse new records while the queue is above its watermarks
+admission = AdmissionControl(QUEUE_HIGH_WATERMARK, QUEUE_LOW_WATERMARK)
 # Create an instance of the StoreApiAdapter using the configuration
 store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
 # Create an instance of the AgentMQTTAdapter using the configuration
 
-# FastAPI
-app = FastAPI()
+# Metrics
+messages_in = Counter("hub_messages_in_total", "Records received", ["source"])
+messages_out = Counter("hub_messages_out_total", "Records sent to the Store", ["result"])
+batch_size = Histogram("hub_batch_size", "Records per Store batch", buckets=SIZE_BUCKETS)
+queue_depth = Gauge("hub_queue_depth", "Records waiting in the Redis queue")
+queue_depth.set_function(lambda: admission.depth)
+admission_paused = Gauge("hub_admission_paused", "1 while new records are refused")
+admission_paused.set_function(lambda: 0 if admission.admitting else 1)
+messages_rejected = Counter("hub_messages_rejected_total", "Records refused over the high watermark")
+flush_duration = Histogram("hub_flush_duration_seconds", "Time to drain and send one batch")
+OUT_LABELS = {SaveResult.SAVED: "ok", SaveResult.RETRY: "failed", SaveResult.REJECTED: "rejected"}
+dead_lettered = Counter("hub_dead_lettered_total", "Records moved to the dead-letter list", ["reason"])
 
 
-@app.post("/processed_agent_data/")
-async def save_processed_agent_data(processed_agent_data: ProcessedAgentData):
-    redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
-    if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        for _ in range(BATCH_SIZE):
-            processed_agent_data = ProcessedAgentData.model_validate_json(
-                redis_client.lpop("processed_agent_data")
-            )
-            processed_agent_data_batch.append(processed_agent_data)
-        print(processed_agent_data_batch)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
-    return {"status": "ok"}
+async def enqueue(records: List[Tuple[ProcessedAgentData, bytes]], source: str):
+    """
+    Queue validated records in Redis with one push and flush full batches.
+    Records are stored as received; only traced records are serialized again
+    so that they carry the hub_enqueue hop.
+    """
+    messages_in.labels(source).inc(len(records))
+    json_records = []
+    for processed_agent_data, raw in records:
+        trace = processed_agent_data.agent_data.trace
+        if trace is not None:
+            record_hop(trace, "hub_enqueue")
+            raw = processed_agent_data.model_dump_json()
+        json_records.append(raw)
+    depth = await queue.push(json_records)
+    admission.update(depth)
+    # Flush as many batches as were added, the periodic flush takes the rest
+    flushed = False
+    for _ in range(max(1, len(records) // BATCH_SIZE)):
+        if depth < BATCH_SIZE:
+            break
+        saved = await flush_batch()
+        if not saved:
+            break
+        depth -= saved
+        flushed = True
+    if flushed:
+        # Without this, a push over the high watermark that was flushed straight
+        # back down would refuse records until the next periodic flush
+        admission.update(depth)
 
 
-# MQTT
-client = mqtt.Client()
+async def flush_batch() -> int:
+    """Send one batch to the Store; returns the number of records saved"""
+    started = time.perf_counter()
+    # Records were validated on receive and are forwarded without parsing
+    entries = await queue.pop_batch(BATCH_SIZE)
+    if not entries:
+        return 0  # Drained concurrently
+    json_records: List[bytes] = [record for _, record in entries]
+    logging.debug(f"Flushing {len(json_records)} records to the Store")
+    result = await store_adapter.save_raw_data(json_records, flush_time=time.time())
+    if result is SaveResult.SAVED:
+        await queue.ack(entries)
+    elif result is SaveResult.REJECTED:
+        # Retrying gets the same answer and would block the queue
+        logging.error(f"Store rejected {len(entries)} records, moved to {QUEUE_DEAD_LETTER}")
+        await queue.dead_letter(entries)
+        dead_lettered.labels("rejected").inc(len(entries))
+    else:
+        # Kept in the queue, so a Store outage raises the depth up to the watermark
+        dead = await queue.release(entries)
+        if dead:
+            logging.error(f"{dead} records failed {QUEUE_MAX_DELIVERIES} deliveries, moved to {QUEUE_DEAD_LETTER}")
+            dead_lettered.labels("max_deliveries").inc(dead)
+    messages_out.labels(OUT_LABELS[result]).inc(len(json_records))
+    batch_size.observe(len(json_records))
+    flush_duration.observe(time.perf_counter() - started)
+    return len(entries) if result is SaveResult.SAVED else 0
 
 
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        logging.info("Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC)
-    else:
-        logging.info(f"Failed to connect to MQTT broker with code: {rc}")
+async def flush_periodically():
+    """
+    Flush records that wait for a full batch longer than QUEUE_FLUSH_INTERVAL;
+    in stream mode this also reclaims records other workers did not acknowledge.
+    """
+    while True:
+        await asyncio.sleep(QUEUE_FLUSH_INTERVAL)
+        try:
+            while await flush_batch() == BATCH_SIZE:
+                pass
+            admission.update(await queue.depth())
+        except Exception as e:
+            logging.error(f"Periodic flush failed: {e}")
 
 
-def on_message(client, userdata, msg):
+# MQTT
+async def handle_message(payload: bytes):
     try:
-        payload: str = msg.payload.decode("utf-8")
         # Create ProcessedAgentData instance with the received data
-        processed_agent_data = ProcessedAgentData.model_validate_json(
-            payload, strict=True
-        )
-
-        redis_client.lpush(
-            "processed_agent_data", processed_agent_data.model_dump_json()
-        )
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-            for _ in range(BATCH_SIZE):
-                processed_agent_data = ProcessedAgentData.model_validate_json(
-                    redis_client.lpop("processed_agent_data")
-                )
-                processed_agent_data_batch.append(processed_agent_data)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
-        return {"status": "ok"}
+        processed_agent_data = ProcessedAgentData.model_validate_json(payload, strict=True)
+        await enqueue([(processed_agent_data, payload)], "mqtt")
     except Exception as e:
         logging.info(f"Error processing MQTT message: {e}")
 
 
-# Connect
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT)
+async def consume_mqtt():
+    """
+    Subscribe to MQTT_TOPIC and handle up to MQTT_MAX_IN_FLIGHT messages
+    concurrently; reconnects until cancelled on shutdown.
+    """
+    in_flight = asyncio.Semaphore(MQTT_MAX_IN_FLIGHT)
+    tasks: Set[asyncio.Task] = set()
+
+    def on_done(task: asyncio.Task):
+        tasks.discard(task)
+        in_flight.release()
+
+    try:
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    MQTT_BROKER_HOST, MQTT_BROKER_PORT,
+                    max_queued_incoming_messages=MQTT_MAX_IN_FLIGHT,
+                ) as client:
+                    logging.info("Connected to MQTT broker")
+                    await client.subscribe(MQTT_TOPIC)
+                    async for message in client.messages:
+                        # Paused above the watermark; the client buffers what arrives meanwhile
+                        await admission.wait()
+                        await in_flight.acquire()
+                        task = asyncio.create_task(handle_message(message.payload))
+                        tasks.add(task)
+                        task.add_done_callback(on_done)
+            except aiomqtt.MqttError as e:
+                logging.info(f"MQTT connection failed: {e}, retrying in {MQTT_RECONNECT_INTERVAL} s")
+                await asyncio.sleep(MQTT_RECONNECT_INTERVAL)
+    finally:
+        # Let accepted messages reach Redis before shutdown
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(consume_mqtt()), asyncio.create_task(flush_periodically())]
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await store_adapter.close()
+    await redis_client.aclose()
+
+
+# FastAPI
+app = FastAPI(lifespan=lifespan)
+
+
+def overloaded_response() -> JSONResponse:
+    messages_rejected.inc()
+    return JSONResponse(
+        status_code=503,
+        content={"status": "overloaded", "queue_depth": admission.depth},
+        headers={"Retry-After": str(QUEUE_RETRY_AFTER), "X-Queue-Depth": str(admission.depth)},
+    )
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """Read the request body, refusing it as soon as it exceeds max_bytes"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Body exceeds {max_bytes} bytes")
+    return bytes(body)
+
+
+@app.post("/processed_agent_data/")
+async def save_processed_agent_data(
+    processed_agent_data: ProcessedAgentData, request: Request, response: Response
+):
+    if not admission.admitting:
+        return overloaded_response()
+    # FastAPI has already read and validated the body, so this is the cached raw bytes
+    await enqueue([(processed_agent_data, await request.body())], "http")
+    # Lets senders slow down before they are refused
+    response.headers["X-Queue-Depth"] = str(admission.depth)
+    return {"status": "ok"}
+
+
+@app.post("/processed_agent_data/batch/")
+async def save_processed_agent_data_batch(request: Request, response: Response):
+    """
+    Many records in one request: a JSON array, or NDJSON with Content-Type
+    application/x-ndjson; either may be gzip-compressed (Content-Encoding: gzip).
+    The batch is accepted or refused as a whole.
+    """
+    if not admission.admitting:
+        return overloaded_response()
+    try:
+        body = decode_body(
+            await read_body(request, BATCH_MAX_BYTES),
+            request.headers.get("content-encoding", ""),
+            BATCH_MAX_BYTES,
+        )
+        records = parse_batch(body, request.headers.get("content-type", ""))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidBatch as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if records:
+        await enqueue(records, "http")
+    response.headers["X-Queue-Depth"] = str(admission.depth)
+    return {"status": "ok", "count": len(records)}
+
+
+@app.get("/queue/")
+async def get_queue():
+    admission.update(await queue.depth())
+    return {
+        "depth": admission.depth,
+        "high_watermark": admission.high_watermark,
+        "low_watermark": admission.low_watermark,
+        "admitting": admission.admitting,
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
 
-# Start
-client.loop_start()
+@app.get("/latency/")
+async def get_latency():
+    """Per-stage hop latency histograms of the messages that passed the hub"""
+    return latency_report()
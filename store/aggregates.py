@@ -0,0 +1,87 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, func
+
+import geohash
+from config import AGGREGATE_GEOHASH_PRECISION
+from database import road_state_aggregates, dialect_insert
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def update_road_state_aggregates(session, rows) -> None:
+    """
+    Add freshly inserted rows to the per cell, per hour counters.
+    Runs in the caller's transaction, so counters and rows commit together.
+    Counters track ingested detections: later updates or deletes of raw rows
+    do not change them.
+    """
+    counts = Counter(
+        (
+            geohash.encode(row.latitude, row.longitude, AGGREGATE_GEOHASH_PRECISION),
+            hour_bucket(row.timestamp),
+            row.road_state or "normal",
+        )
+        for row in rows
+        if row.latitude is not None and row.longitude is not None and row.timestamp is not None
+    )
+    if not counts:
+        return
+
+    query = dialect_insert(road_state_aggregates)
+    query = query.on_conflict_do_update(
+        index_elements=[
+            road_state_aggregates.c.geohash,
+            road_state_aggregates.c.hour,
+            road_state_aggregates.c.road_state,
+        ],
+        set_={"count": road_state_aggregates.c.count + query.excluded.count},
+    )
+    # Sorted keys keep the lock order stable between concurrent batches
+    session.execute(query, [
+        dict(geohash=cell, hour=hour, road_state=road_state, count=count)
+        for (cell, hour, road_state), count in sorted(counts.items())
+    ])
+
+
+def select_road_state_aggregates(
+    geohash_prefix: str = "",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    road_state: Optional[str] = None,
+    precision: Optional[int] = None,
+):
+    """
+    Build the aggregates query for cells inside geohash_prefix.
+    With precision lower than the stored one, cells are merged into their
+    parent cells of that geohash length.
+    """
+    table = road_state_aggregates
+    if precision is not None and precision < AGGREGATE_GEOHASH_PRECISION:
+        cell = func.substr(table.c.geohash, 1, precision)
+    else:
+        cell = table.c.geohash
+    query = select(
+        cell.label("geohash"),
+        table.c.hour,
+        table.c.road_state,
+        func.sum(table.c.count).label("count"),
+    ).group_by(cell, table.c.hour, table.c.road_state)
+
+    if geohash_prefix:
+        # Range instead of LIKE, so the primary key index is usable in any collation
+        query = query.where(
+            table.c.geohash >= geohash_prefix,
+            table.c.geohash < geohash_prefix + "~",
+        )
+    if start is not None:
+        query = query.where(table.c.hour >= hour_bucket(start))
+    if end is not None:
+        query = query.where(table.c.hour < end)
+    if road_state is not None:
+        query = query.where(table.c.road_state == road_state)
+    return query.order_by(cell, table.c.hour)
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+
+from database import engine
+from metrics import Counter
+from config import BROADCAST_BACKEND, BROADCAST_CHANNEL, BROADCAST_REDIS_URL, BROADCAST_RECONNECT_INTERVAL
+
+Message = Dict[str, Any]
+Deliver = Callable[[List[Message]], Awaitable[None]]
+
+broadcast_published = Counter("store_broadcast_published_total", "Websocket messages published to all workers")
+broadcast_received = Counter("store_broadcast_received_total", "Websocket messages received from the broadcast")
+broadcast_errors = Counter("store_broadcast_errors_total", "Broadcast publish and listen failures", ["operation"])
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+
+class Broadcast(ABC):
+    """
+    Fans inserted records out to the websocket subscribers of every worker.
+    Each worker publishes what it inserted and delivers whatever it receives,
+    its own messages included, to its local subscribers. Delivery is best
+    effort: messages published while a worker is disconnected are lost.
+    """
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, messages: List[Message]) -> None:
+        """Send messages to every worker, this one included"""
+        pass
+
+    async def _receive(self, messages: List[Message]) -> None:
+        if self.deliver is None:
+            # Not started (no lifespan, e.g. benchmarks), so nobody is subscribed
+            return
+        broadcast_received.inc(len(messages))
+        try:
+            await self.deliver(messages)
+        except Exception as e:
+            logging.error(f"Broadcast delivery failed: {e}")
+
+
+class LocalBroadcast(Broadcast):
+    """Single worker: messages go straight to this worker's subscribers"""
+
+    async def publish(self, messages: List[Message]) -> None:
+        broadcast_published.inc(len(messages))
+        await self._receive(messages)
+
+
+class ListeningBroadcast(Broadcast):
+    """Broadcast through an external server, listened to by a reconnecting task"""
+
+    def __init__(self, reconnect_interval: float):
+        super().__init__()
+        self.reconnect_interval = reconnect_interval
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._listener = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def publish(self, messages: List[Message]) -> None:
+        if not messages:
+            return
+        try:
+            await self._publish(messages)
+            broadcast_published.inc(len(messages))
+        except Exception as e:
+            broadcast_errors.labels("publish").inc()
+            logging.error(f"Broadcast publish failed: {e}")
+
+    async def _listen_forever(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                broadcast_errors.labels("listen").inc()
+                logging.error(f"Broadcast listener failed, reconnecting: {e}")
+            await asyncio.sleep(self.reconnect_interval)
+
+    @abstractmethod
+    async def _publish(self, messages: List[Message]) -> None:
+        """Send messages to the server; errors are counted by publish()"""
+        pass
+
+    @abstractmethod
+    async def _listen(self) -> None:
+        """Receive until the connection fails; _listen_forever() reconnects"""
+        pass
+
+
+class RedisBroadcast(ListeningBroadcast):
+    """Redis pub/sub, one JSON array of messages per insert"""
+
+    def __init__(self, redis_url: str, channel: str, reconnect_interval: float):
+        super().__init__(reconnect_interval)
+        # Optional dependency, only needed for this backend
+        from redis.asyncio import Redis
+        self.redis_client = Redis.from_url(redis_url)
+        self.channel = channel
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self.redis_client.aclose()
+
+    async def _publish(self, messages: List[Message]) -> None:
+        await self.redis_client.publish(self.channel, json.dumps(messages))
+
+    async def _listen(self) -> None:
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                await self._receive(json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+
+
+class PostgresBroadcast(ListeningBroadcast):
+    """
+    PostgreSQL LISTEN/NOTIFY on the store's own database, no extra server.
+    Messages are split into NOTIFY payloads under 8000 bytes.
+    """
+
+    def __init__(self, channel: str, reconnect_interval: float):
+        super().__init__(reconnect_interval)
+        self.channel = channel
+
+    async def _publish(self, messages: List[Message]) -> None:
+        await asyncio.to_thread(self._notify, self._payloads(messages))
+
+    def _notify(self, payloads: List[str]) -> None:
+        with engine.begin() as connection:
+            for payload in payloads:
+                connection.execute(select(func.pg_notify(self.channel, payload)))
+
+    def _payloads(self, messages: List[Message]) -> List[str]:
+        payloads, chunk, size = [], [], 2
+        for message in messages:
+            encoded = json.dumps(message)
+            if chunk and size + len(encoded) + 1 > NOTIFY_MAX_BYTES:
+                payloads.append("[" + ",".join(chunk) + "]")
+                chunk, size = [], 2
+            chunk.append(encoded)
+            size += len(encoded) + 1
+        if chunk:
+            payloads.append("[" + ",".join(chunk) + "]")
+        return payloads
+
+    async def _listen(self) -> None:
+        # A dedicated connection outside the pool, watched by the event loop
+        import psycopg2
+        import psycopg2.extensions
+
+        connection = await asyncio.to_thread(
+            psycopg2.connect, engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        )
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        fd = connection.fileno()
+        loop = asyncio.get_running_loop()
+        # Notification payloads, or the error that broke the connection
+        received: asyncio.Queue = asyncio.Queue()
+
+        def on_readable():
+            try:
+                connection.poll()
+            except Exception as e:
+                loop.remove_reader(fd)
+                received.put_nowait(e)
+                return
+            while connection.notifies:
+                received.put_nowait(connection.notifies.pop(0).payload)
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            loop.add_reader(fd, on_readable)
+            while True:
+                payload = await received.get()
+                if isinstance(payload, Exception):
+                    raise payload
+                await self._receive(json.loads(payload))
+        finally:
+            loop.remove_reader(fd)
+            connection.close()
+
+
+def create_broadcast() -> Broadcast:
+    if BROADCAST_BACKEND == "redis":
+        return RedisBroadcast(BROADCAST_REDIS_URL, BROADCAST_CHANNEL, BROADCAST_RECONNECT_INTERVAL)
+    if BROADCAST_BACKEND == "postgres":
+        return PostgresBroadcast(BROADCAST_CHANNEL, BROADCAST_RECONNECT_INTERVAL)
+    if BROADCAST_BACKEND != "local":
+        raise ValueError(f"Unknown BROADCAST_BACKEND {BROADCAST_BACKEND!r}, use local, redis or postgres")
+    return LocalBroadcast()
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from models.modelsDB import ProcessedAgentDataInDB
+from metrics import Counter, Gauge
+from config import CACHE_SIZE, CACHE_TTL, CACHE_REDIS_URL, CACHE_REDIS_TTL
+
+cache_lookups = Counter("store_cache_lookups_total", "Record cache lookups", ["result"])
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping with a per-entry time to live.
+    Thread-safe, since sync endpoints run in FastAPI's thread pool.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[object, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RecordCache:
+    """
+    Read-through cache of processed_agent_data rows by id: an in-process LRU,
+    optionally backed by Redis shared between workers. Writers invalidate the
+    ids they change; a Redis failure only costs a database lookup.
+
+    A reader takes generation(id) before its database query and passes it to
+    set(), which skips the fill if the id was invalidated meanwhile, so a row
+    read before a concurrent change is not cached after it. In Redis,
+    invalidation leaves a short-lived tombstone that fills do not overwrite.
+    """
+
+    KEY_PREFIX = "store:processed_agent_data:"
+    # Invalidation counters, one per stripe of ids: bounded, and a collision only skips a fill
+    GENERATION_STRIPES = 4096
+    # Seconds a Redis tombstone outlives an invalidation, longer than any database read
+    TOMBSTONE_TTL = 30
+    TOMBSTONE = b""
+
+    def __init__(self, max_size: int, ttl: float, redis_url: str = "", redis_ttl: int = 0):
+        self.local = LRUCache(max_size, ttl)
+        self.redis_ttl = redis_ttl
+        self._generations = [0] * self.GENERATION_STRIPES
+        # Orders invalidations against local fills
+        self._lock = threading.Lock()
+        self.redis = None
+        if redis_url:
+            # Optional dependency, only needed for the shared tier
+            import redis
+            self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+
+    def generation(self, record_id: int) -> int:
+        return self._generations[record_id % self.GENERATION_STRIPES]
+
+    def get(self, record_id: int) -> Optional[ProcessedAgentDataInDB]:
+        record = self.local.get(record_id)
+        if record is not None:
+            cache_lookups.labels("hit_local").inc()
+            return record
+        if self.redis is not None:
+            generation = self.generation(record_id)
+            try:
+                payload = self.redis.get(self.KEY_PREFIX + str(record_id))
+            except Exception as e:
+                logging.warning(f"Record cache Redis lookup failed: {e}")
+                payload = None
+            if payload:
+                record = ProcessedAgentDataInDB.model_validate_json(payload)
+                self._set_local(record, generation)
+                cache_lookups.labels("hit_redis").inc()
+                return record
+        cache_lookups.labels("miss").inc()
+        return None
+
+    def set(self, record: ProcessedAgentDataInDB, generation: int) -> None:
+        """Cache a row read after generation(record.id) returned generation"""
+        if not self._set_local(record, generation):
+            return
+        if self.redis is not None:
+            try:
+                # nx: an invalidation's tombstone, or a newer fill, wins
+                self.redis.set(self.KEY_PREFIX + str(record.id), record.model_dump_json(),
+                               ex=self.redis_ttl or None, nx=True)
+            except Exception as e:
+                logging.warning(f"Record cache Redis update failed: {e}")
+
+    def _set_local(self, record: ProcessedAgentDataInDB, generation: int) -> bool:
+        with self._lock:
+            if self.generation(record.id) != generation:
+                return False  # Invalidated since it was read
+            self.local.set(record.id, record)
+            return True
+
+    def invalidate(self, record_ids: Iterable[int]) -> None:
+        record_ids = list(record_ids)
+        with self._lock:
+            for record_id in record_ids:
+                self._generations[record_id % self.GENERATION_STRIPES] += 1
+                self.local.delete(record_id)
+        if self.redis is not None and record_ids:
+            try:
+                with self.redis.pipeline(transaction=False) as pipe:
+                    for record_id in record_ids:
+                        pipe.set(self.KEY_PREFIX + str(record_id), self.TOMBSTONE, ex=self.TOMBSTONE_TTL)
+                    pipe.execute()
+            except Exception as e:
+                logging.warning(f"Record cache Redis invalidation failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self.local.clear()
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(self.KEY_PREFIX + "*", count=1000))
+                for start in range(0, len(keys), 1000):
+                    self.redis.delete(*keys[start:start + 1000])
+            except Exception as e:
+                logging.warning(f"Record cache Redis clear failed: {e}")
+
+
+record_cache = RecordCache(CACHE_SIZE, CACHE_TTL, CACHE_REDIS_URL, CACHE_REDIS_TTL)
+cache_size = Gauge("store_cache_entries", "Records held in the in-process cache")
+cache_size.set_function(lambda: len(record_cache.local))
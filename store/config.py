@@ -10,4 +10,71 @@ POSTGRES_HOST = os.environ.get("POSTGRES_HOST") or "localhost"
 POSTGRES_PORT = try_parse(int, os.environ.get("POSTGRES_PORT")) or 5432
 POSTGRES_USER = os.environ.get("POSTGRES_USER") or "user"
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASS") or "pass"
-POSTGRES_DB = os.environ.get("POSTGRES_DB") or "test_db"
\ No newline at end of file
+POSTGRES_DB = os.environ.get("POSTGRES_DB") or "test_db"
+DATABASE_URL = os.environ.get("DATABASE_URL") or f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+# Road quality aggregates: geohash length of an aggregate cell (7 is ~150x150 m)
+AGGREGATE_GEOHASH_PRECISION = try_parse(int, os.environ.get("AGGREGATE_GEOHASH_PRECISION")) or 7
+
+# Road defects: detections of these road states within DEFECT_RADIUS_M metres
+# of a known defect count as hits of it, the others start a new defect
+DEFECT_ROAD_STATES = set((os.environ.get("DEFECT_ROAD_STATES") or "pothole,bump").split(","))
+DEFECT_RADIUS_M = try_parse(float, os.environ.get("DEFECT_RADIUS_M")) or 10.0
+# Hits at which a defect's confidence reaches 0.5
+DEFECT_CONFIDENCE_HITS = try_parse(float, os.environ.get("DEFECT_CONFIDENCE_HITS")) or 3.0
+
+# Time partitioning of processed_agent_data (PostgreSQL only)
+PARTITION_INTERVAL = os.environ.get("PARTITION_INTERVAL") or "day"  # "day" or "week"
+# Number of future partitions created ahead of time
+PARTITION_PRECREATE = try_parse(int, os.environ.get("PARTITION_PRECREATE")) or 2
+# Partitions older than this many days are dropped, 0 keeps everything
+PARTITION_RETENTION_DAYS = try_parse(int, os.environ.get("PARTITION_RETENTION_DAYS")) or 0
+# Seconds between partition maintenance runs
+PARTITION_MAINTENANCE_INTERVAL = try_parse(int, os.environ.get("PARTITION_MAINTENANCE_INTERVAL")) or 3600
+
+# Record cache for GET /processed_agent_data/{id}: in-process LRU entries (0 disables)
+CACHE_SIZE = try_parse(int, os.environ.get("CACHE_SIZE"))
+if CACHE_SIZE is None:
+    CACHE_SIZE = 10000
+# Seconds an in-process entry is trusted; bounds staleness across workers, 0 keeps entries until evicted
+CACHE_TTL = try_parse(float, os.environ.get("CACHE_TTL"))
+if CACHE_TTL is None:
+    CACHE_TTL = 300
+# Optional Redis second tier shared by workers, e.g. redis://redis:6379/0; empty disables it
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL") or ""
+CACHE_REDIS_TTL = try_parse(int, os.environ.get("CACHE_REDIS_TTL")) or 3600
+
+# Group commit: an ingest request waits up to this many milliseconds for concurrent
+# ones to share its transaction, or until the rows pending reach INGEST_COMMIT_MAX_ROWS
+INGEST_COMMIT_DELAY_MS = try_parse(float, os.environ.get("INGEST_COMMIT_DELAY_MS"))
+if INGEST_COMMIT_DELAY_MS is None:
+    INGEST_COMMIT_DELAY_MS = 5
+INGEST_COMMIT_DELAY = INGEST_COMMIT_DELAY_MS / 1000
+# 0 disables group commit, every request then commits on its own
+INGEST_COMMIT_MAX_ROWS = try_parse(int, os.environ.get("INGEST_COMMIT_MAX_ROWS"))
+if INGEST_COMMIT_MAX_ROWS is None:
+    INGEST_COMMIT_MAX_ROWS = 5000
+
+# Websocket subscription index: grid cell size in degrees (0.01 is ~1 km), and the
+# largest number of cells a bbox is indexed by before it is checked for every record
+WS_INDEX_CELL_SIZE = try_parse(float, os.environ.get("WS_INDEX_CELL_SIZE")) or 0.01
+WS_INDEX_MAX_CELLS = try_parse(int, os.environ.get("WS_INDEX_MAX_CELLS")) or 4096
+
+# Fan-out of inserted records to the websocket clients of all workers:
+# "local" (single worker), "redis" (pub/sub) or "postgres" (LISTEN/NOTIFY)
+BROADCAST_BACKEND = os.environ.get("BROADCAST_BACKEND") or "local"
+BROADCAST_CHANNEL = os.environ.get("BROADCAST_CHANNEL") or "store_processed_agent_data"
+BROADCAST_REDIS_URL = os.environ.get("BROADCAST_REDIS_URL") or "redis://localhost:6379/0"
+# Seconds before a lost broadcast listener reconnects
+BROADCAST_RECONNECT_INTERVAL = try_parse(float, os.environ.get("BROADCAST_RECONNECT_INTERVAL")) or 1.0
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+LOG_FILE = os.environ.get("LOG_FILE") or ""  # Empty logs to the console only
+# Records waiting for the log writer thread; more are dropped, not waited on
+LOG_QUEUE_SIZE = try_parse(int, os.environ.get("LOG_QUEUE_SIZE")) or 10000
+# Full payloads allowed into the log per second, 0 disables payload logging
+LOG_PAYLOAD_RATE = try_parse(float, os.environ.get("LOG_PAYLOAD_RATE"))
+if LOG_PAYLOAD_RATE is None:
+    LOG_PAYLOAD_RATE = 1.0
+LOG_PAYLOAD_MAX_CHARS = try_parse(int, os.environ.get("LOG_PAYLOAD_MAX_CHARS")) or 1000
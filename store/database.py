@@ -0,0 +1,79 @@
+from sqlalchemy import (
+    create_engine,
+    MetaData,
+    Table,
+    Column,
+    Index,
+    Integer,
+    String,
+    Float,
+    DateTime,
+)
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from config import DATABASE_URL
+
+engine = create_engine(DATABASE_URL)
+metadata = MetaData()
+# On PostgreSQL the table is range partitioned by timestamp (see partitions.py),
+# which requires the partition key to be part of the primary key
+partitioned = engine.dialect.name == "postgresql"
+# Define the ProcessedAgentData table
+processed_agent_data = Table(
+    "processed_agent_data",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True, index=True),
+    Column("user_id", Integer),
+    Column("road_state", String),
+    Column("x", Float),
+    Column("y", Float),
+    Column("z", Float),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("timestamp", DateTime, primary_key=partitioned),
+    # Natural key: a device reports one reading per timestamp, so retried
+    # batches are deduplicated by the insert (see insert_processed_agent_data)
+    Index("uq_processed_agent_data_user_id_timestamp", "user_id", "timestamp", unique=True),
+    postgresql_partition_by="RANGE (timestamp)",
+)
+# Detections per road state, per geohash cell, per hour
+road_state_aggregates = Table(
+    "road_state_aggregates",
+    metadata,
+    Column("geohash", String(12), primary_key=True),
+    Column("hour", DateTime, primary_key=True),
+    Column("road_state", String, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+# Repeated pothole and bump detections merged into one entity per spot (see defects.py)
+road_defects = Table(
+    "road_defects",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("road_state", String, nullable=False),
+    # Mean position of the detections
+    Column("latitude", Float, nullable=False),
+    Column("longitude", Float, nullable=False),
+    Column("hits", Integer, nullable=False),
+    Column("first_seen", DateTime, nullable=False),
+    Column("last_seen", DateTime, nullable=False),
+    Index("ix_road_defects_latitude_longitude", "latitude", "longitude"),
+)
+SessionLocal = sessionmaker(bind=engine)
+
+
+def stored_timestamp(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored without a time zone, aware ones as UTC"""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def dialect_insert(table: Table):
+    """INSERT construct with on_conflict_* support for the configured database"""
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
@@ -0,0 +1,251 @@
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, or_, select, text
+
+from database import engine, road_defects
+from config import DEFECT_ROAD_STATES, DEFECT_RADIUS_M, DEFECT_CONFIDENCE_HITS
+
+EARTH_RADIUS_M = 6371000.0
+# Metres per degree of latitude, and of longitude at the equator
+METRES_PER_DEGREE = 111320.0
+
+Cell = Tuple[int, int]
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def confidence(hits: int) -> float:
+    return hits / (hits + DEFECT_CONFIDENCE_HITS)
+
+
+@dataclass
+class Defect:
+    id: Optional[int]
+    road_state: str
+    latitude: float
+    longitude: float
+    hits: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+class DefectIndex:
+    """
+    Known defects on a grid of radius-sized cells, so the nearest defect of a
+    detection is searched in the 3x3 cells around it instead of all defects.
+    Loaded from road_defects on first use and kept by this worker's inserts;
+    defects of other workers are merged in when a detection misses the grid
+    (see update_road_defects).
+    """
+
+    def __init__(self, radius: float):
+        self.radius = radius
+        self._cells: Dict[Cell, List[Defect]] = {}
+        self._by_id: Dict[int, Defect] = {}
+        self._loaded = False
+        # Held from matching until the defect rows are written, so concurrent
+        # transactions of this worker do not create the same defect twice
+        self.lock = threading.Lock()
+
+    def cell(self, latitude: float, longitude: float) -> Cell:
+        # Longitude degrees shrink towards the poles; cells stay about radius wide
+        x = longitude * METRES_PER_DEGREE * math.cos(math.radians(latitude))
+        return math.floor(latitude * METRES_PER_DEGREE / self.radius), math.floor(x / self.radius)
+
+    def nearest(self, road_state: str, latitude: float, longitude: float) -> Optional[Defect]:
+        row, column = self.cell(latitude, longitude)
+        best, best_distance = None, self.radius
+        for d_row in (-1, 0, 1):
+            for d_column in (-1, 0, 1):
+                for defect in self._cells.get((row + d_row, column + d_column), ()):
+                    if defect.road_state != road_state:
+                        continue
+                    distance = haversine(latitude, longitude, defect.latitude, defect.longitude)
+                    if distance <= best_distance:
+                        best, best_distance = defect, distance
+        return best
+
+    def add(self, defect: Defect) -> None:
+        self._cells.setdefault(self.cell(defect.latitude, defect.longitude), []).append(defect)
+        if defect.id is not None:
+            self._by_id[defect.id] = defect
+
+    def set_id(self, defect: Defect, defect_id: int) -> None:
+        defect.id = defect_id
+        self._by_id[defect_id] = defect
+
+    def merge(self, rows) -> None:
+        """Add stored defects, or bring known ones up to their stored position and hits"""
+        for row in rows:
+            known = self._by_id.get(row.id)
+            if known is None:
+                self.add(Defect(**row._mapping))
+                continue
+            self.move(known, row.latitude, row.longitude)
+            known.hits, known.last_seen = row.hits, row.last_seen
+
+    def move(self, defect: Defect, latitude: float, longitude: float) -> None:
+        old, new = self.cell(defect.latitude, defect.longitude), self.cell(latitude, longitude)
+        defect.latitude, defect.longitude = latitude, longitude
+        if old != new:
+            self._cells[old].remove(defect)
+            if not self._cells[old]:
+                del self._cells[old]
+            self._cells.setdefault(new, []).append(defect)
+
+    def ensure_loaded(self, session) -> None:
+        if self._loaded:
+            return
+        self._cells = {}
+        self._by_id = {}
+        for row in session.execute(select(road_defects)).all():
+            self.add(Defect(**row._mapping))
+        self._loaded = True
+
+    def invalidate(self) -> None:
+        """Reload from the database on next use, after a transaction with defect changes failed"""
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return sum(len(defects) for defects in self._cells.values())
+
+
+defect_index = DefectIndex(DEFECT_RADIUS_M)
+
+# Built once, they run for every batch with detections
+insert_defects = road_defects.insert().returning(road_defects.c.id, sort_by_parameter_order=True)
+# Adds a batch's hits to the stored ones, which other workers may have added to
+add_defect_hits = road_defects.update().where(road_defects.c.id == bindparam("defect_id")).values(
+    latitude=(road_defects.c.latitude * road_defects.c.hits + bindparam("latitude_sum"))
+    / (road_defects.c.hits + bindparam("batch_hits")),
+    longitude=(road_defects.c.longitude * road_defects.c.hits + bindparam("longitude_sum"))
+    / (road_defects.c.hits + bindparam("batch_hits")),
+    hits=road_defects.c.hits + bindparam("batch_hits"),
+    last_seen=case(
+        (road_defects.c.last_seen < bindparam("seen"), bindparam("seen")), else_=road_defects.c.last_seen
+    ),
+)
+
+
+def select_defects_near(points: List[Tuple[str, float, float]], radius: float):
+    """Stored defects within radius of any (road_state, latitude, longitude), through the lat/lon index"""
+    c = road_defects.c
+    boxes = []
+    for road_state, latitude, longitude in points:
+        d_lat = radius / METRES_PER_DEGREE
+        d_lon = radius / (METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+        boxes.append(and_(
+            c.latitude.between(latitude - d_lat, latitude + d_lat),
+            c.longitude.between(longitude - d_lon, longitude + d_lon),
+            c.road_state == road_state,
+        ))
+    return select(road_defects).where(or_(*boxes))
+
+
+def merge_stored_defects(session, detections) -> None:
+    """
+    Look up in road_defects the detections that miss the grid, so defects
+    created by other workers are hit instead of duplicated. On Postgres an
+    advisory lock held until commit serializes this with other workers'
+    defect creation; the lookup then sees what they committed.
+    """
+    misses = [
+        (row.road_state, row.latitude, row.longitude) for row in detections
+        if defect_index.nearest(row.road_state, row.latitude, row.longitude) is None
+    ]
+    if not misses:
+        return
+    if engine.dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": road_defects.name})
+    defect_index.merge(session.execute(select_defects_near(misses, defect_index.radius)).all())
+
+
+def update_road_defects(session, rows) -> None:
+    """
+    Merge freshly inserted detections into road defects: each counts as a hit
+    of the nearest defect of its road state within DEFECT_RADIUS_M, moving it
+    to the mean of its hits, or starts a new one. Runs in the caller's
+    transaction; call defect_index.invalidate() if it does not commit.
+    """
+    detections = [
+        row for row in rows
+        if row.road_state in DEFECT_ROAD_STATES
+        and row.latitude is not None and row.longitude is not None and row.timestamp is not None
+    ]
+    if not detections:
+        return
+
+    with defect_index.lock:
+        defect_index.ensure_loaded(session)
+        merge_stored_defects(session, detections)
+        created: List[Defect] = []
+        # Existing defect id -> [hits, latitude sum, longitude sum, last seen] of this batch
+        hits: Dict[int, list] = {}
+        for row in sorted(detections, key=lambda row: row.timestamp):
+            defect = defect_index.nearest(row.road_state, row.latitude, row.longitude)
+            if defect is None:
+                defect = Defect(None, row.road_state, row.latitude, row.longitude, 0, row.timestamp, row.timestamp)
+                defect_index.add(defect)
+                created.append(defect)
+            elif defect.id is not None:
+                batch = hits.setdefault(defect.id, [0, 0.0, 0.0, row.timestamp])
+                batch[0] += 1
+                batch[1] += row.latitude
+                batch[2] += row.longitude
+                batch[3] = max(batch[3], row.timestamp)
+            # Running mean, matching add_defect_hits
+            defect_index.move(
+                defect,
+                (defect.latitude * defect.hits + row.latitude) / (defect.hits + 1),
+                (defect.longitude * defect.hits + row.longitude) / (defect.hits + 1),
+            )
+            defect.hits += 1
+            defect.last_seen = max(defect.last_seen, row.timestamp)
+
+        if created:
+            ids = session.execute(insert_defects, [
+                dict(road_state=d.road_state, latitude=d.latitude, longitude=d.longitude, hits=d.hits,
+                     first_seen=d.first_seen, last_seen=d.last_seen)
+                for d in created
+            ]).scalars().all()
+            for defect, defect_id in zip(created, ids):
+                defect_index.set_id(defect, defect_id)
+        if hits:
+            session.execute(
+                add_defect_hits,
+                [
+                    dict(defect_id=defect_id, batch_hits=count, latitude_sum=lat_sum,
+                         longitude_sum=lon_sum, seen=seen)
+                    for defect_id, (count, lat_sum, lon_sum, seen) in sorted(hits.items())
+                ],
+            )
+
+
+def select_road_defects(
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    road_state: Optional[str] = None,
+    min_hits: int = 1,
+    since: Optional[datetime] = None,
+    limit: int = 1000,
+):
+    """Defects with the most hits first; bbox is min_lon, min_lat, max_lon, max_lat"""
+    c = road_defects.c
+    query = select(road_defects).where(c.hits >= min_hits)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        query = query.where(c.latitude.between(min_lat, max_lat), c.longitude.between(min_lon, max_lon))
+    if road_state is not None:
+        query = query.where(c.road_state == road_state)
+    if since is not None:
+        query = query.where(c.last_seen >= since)
+    return query.order_by(c.hits.desc(), c.id).limit(limit)
@@ -1,10 +1,39 @@
+-- Partitioned by time; the store creates partitions on demand (see partitions.py)
 CREATE TABLE processed_agent_data (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
+    user_id INTEGER,
     road_state VARCHAR(255) NOT NULL,
     x FLOAT,
     y FLOAT,
     z FLOAT,
     latitude FLOAT,
     longitude FLOAT,
-    timestamp TIMESTAMP
-);
\ No newline at end of file
+    timestamp TIMESTAMP NOT NULL,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Natural key, retried inserts of the same reading are skipped
+CREATE UNIQUE INDEX uq_processed_agent_data_user_id_timestamp
+    ON processed_agent_data (user_id, timestamp);
+
+CREATE TABLE road_state_aggregates (
+    geohash VARCHAR(12) NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    road_state VARCHAR NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (geohash, hour, road_state)
+);
+
+-- Repeated pothole and bump detections merged per spot
+CREATE TABLE road_defects (
+    id SERIAL PRIMARY KEY,
+    road_state VARCHAR NOT NULL,
+    latitude FLOAT NOT NULL,
+    longitude FLOAT NOT NULL,
+    hits INTEGER NOT NULL,
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL
+);
+
+CREATE INDEX ix_road_defects_latitude_longitude
+    ON road_defects (latitude, longitude);
@@ -0,0 +1,153 @@
+import argparse
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from database import SessionLocal, processed_agent_data, stored_timestamp
+
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+ARROW_TYPES = {
+    "id": pa.int64(),
+    "user_id": pa.int64(),
+    "road_state": pa.string(),
+    "x": pa.float64(),
+    "y": pa.float64(),
+    "z": pa.float64(),
+    "latitude": pa.float64(),
+    "longitude": pa.float64(),
+    "timestamp": pa.timestamp("us"),
+}
+
+
+class _ChunkSink:
+    """Write-only file object that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_schema(columns: List[str]) -> pa.Schema:
+    return pa.schema([(name, ARROW_TYPES[name]) for name in columns])
+
+
+def export_batches(
+    columns: List[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 10000,
+) -> Iterator[pa.RecordBatch]:
+    """Read rows through a server-side cursor and convert them to record batches"""
+    table = processed_agent_data
+    query = select(*[table.c[name] for name in columns]).order_by(table.c.timestamp)
+    if start is not None:
+        query = query.where(table.c.timestamp >= stored_timestamp(start))
+    if end is not None:
+        query = query.where(table.c.timestamp < stored_timestamp(end))
+
+    schema = export_schema(columns)
+    with SessionLocal() as session:
+        result = session.execute(
+            query.execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for rows in result.partitions():
+            arrays = [
+                pa.array(values, type=ARROW_TYPES[name])
+                for name, values in zip(columns, zip(*rows))
+            ]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_export(
+    format: str,
+    columns: List[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 10000,
+) -> Iterator[bytes]:
+    """
+    Encode the export as an Arrow IPC stream or a Parquet file.
+    Bytes are yielded after every batch, so memory stays at one batch
+    (for Parquet, one row group) whatever the size of the export.
+    """
+    sink = _ChunkSink()
+    schema = export_schema(columns)
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for batch in export_batches(columns, start, end, batch_size):
+        writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+    """Validate a comma separated column projection, None selects all columns"""
+    if not columns:
+        return list(ARROW_TYPES)
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    if not names:
+        raise ValueError("No columns given")
+    unknown = [name for name in names if name not in ARROW_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate columns: {', '.join(duplicates)}")
+    return names
+
+
+def positive_int(value: str) -> int:
+    """argparse type matching the HTTP endpoint's batch_size check"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {value}")
+    return number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export processed agent data")
+    parser.add_argument("output", help="Output file")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--columns", help="Comma separated columns, all by default")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--batch-size", type=positive_int, default=10000)
+    args = parser.parse_args()
+    try:
+        column_names = parse_columns(args.columns)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.output, "wb") as file:
+        for chunk in stream_export(
+            args.format, column_names, args.start, args.end, args.batch_size
+        ):
+            file.write(chunk)
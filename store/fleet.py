@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from database import engine, processed_agent_data
+from metrics import Gauge
+
+Message = Dict[str, Any]
+
+
+def select_latest_per_device(*columns):
+    """
+    The newest row of every user_id. Postgres has no loose index scan, so this
+    reads the whole (user_id, timestamp) index: for startup, not per request.
+    """
+    table = processed_agent_data
+    if engine.dialect.name == "postgresql":
+        return select(*columns).distinct(table.c.user_id).order_by(
+            table.c.user_id, table.c.timestamp.desc(), table.c.id.desc()
+        )
+    ranked = select(
+        *columns,
+        func.row_number().over(
+            partition_by=table.c.user_id, order_by=(table.c.timestamp.desc(), table.c.id.desc())
+        ).label("rank"),
+    ).subquery()
+    return select(*(ranked.c[column.name] for column in columns)).where(ranked.c.rank == 1)
+
+
+def select_latest_of_device(user_id: Optional[int], *columns):
+    """The newest row of one user_id, a single (user_id, timestamp) index probe"""
+    table = processed_agent_data
+    return select(*columns).where(
+        table.c.user_id.is_(None) if user_id is None else table.c.user_id == user_id
+    ).order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(1)
+
+
+class FleetState:
+    """
+    Last known websocket message per device (user_id), kept up to date from
+    the broadcast of inserts so every worker sees the whole fleet. A reading
+    replaces the stored one only if it is newer, so late retries do not move
+    a device back.
+    """
+
+    def __init__(self):
+        self._latest: Dict[Optional[int], Tuple[tuple, Message]] = {}
+        # One dict per reload in progress, collecting the updates made while it reads the database
+        self._during_reload: List[Dict[Optional[int], Tuple[tuple, Message]]] = []
+        self._lock = threading.Lock()
+
+    def update(self, messages: Iterable[Message]) -> None:
+        with self._lock:
+            for message in messages:
+                self._put(self._latest, message)
+                for captured in self._during_reload:
+                    self._put(captured, message)
+
+    def reload(
+        self,
+        fetch: Callable[[], Iterable[Message]],
+        user_ids: Optional[Collection[Optional[int]]] = None,
+    ) -> None:
+        """
+        Replace the state with fetch()'s messages, read from the database, or
+        only the given devices' entries: a device fetch() returns nothing for
+        is evicted. Rows changed or deleted since are dropped; inserts
+        broadcast while fetch() runs are kept.
+        """
+        captured: Dict[Optional[int], Tuple[tuple, Message]] = {}
+        with self._lock:
+            self._during_reload.append(captured)
+        loaded: Dict[Optional[int], Tuple[tuple, Message]] = {}
+        try:
+            for message in fetch():
+                self._put(loaded, message)
+        except Exception:
+            with self._lock:
+                self._stop_capture(captured)
+            raise
+        with self._lock:
+            self._stop_capture(captured)
+            # Merged under the same lock hold, so no update falls in between
+            for _, message in captured.values():
+                self._put(loaded, message)
+            if user_ids is None:
+                self._latest = loaded
+            else:
+                for user_id in user_ids:
+                    if user_id in loaded:
+                        self._latest[user_id] = loaded[user_id]
+                    else:
+                        self._latest.pop(user_id, None)
+
+    def _stop_capture(self, captured) -> None:
+        # By identity: the dicts of concurrent reloads may be equal
+        self._during_reload = [other for other in self._during_reload if other is not captured]
+
+    def user_ids_holding(self, ids: Collection[int]) -> Set[Optional[int]]:
+        """Devices whose latest message is one of the given row ids"""
+        ids = set(ids)
+        with self._lock:
+            return {user_id for user_id, (_, message) in self._latest.items() if message["id"] in ids}
+
+    def snapshot(self) -> List[Message]:
+        """Every device's latest message, oldest id first like the live stream"""
+        with self._lock:
+            messages = [message for _, message in self._latest.values()]
+        return sorted(messages, key=lambda message: message["id"])
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    @staticmethod
+    def _put(latest, message: Message) -> None:
+        timestamp = message["timestamp"]
+        order = (datetime.fromisoformat(timestamp) if timestamp else datetime.min, message["id"])
+        current = latest.get(message["user_id"])
+        if current is None or current[0] < order:
+            latest[message["user_id"]] = (order, message)
+
+
+fleet_state = FleetState()
+Gauge("store_fleet_devices", "Devices in the latest-state cache").set_function(lambda: len(fleet_state))
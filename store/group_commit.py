@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+
+from metrics import Histogram, SIZE_BUCKETS
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+group_commit_requests = Histogram(
+    "store_group_commit_requests", "Ingest requests written per transaction", buckets=SIZE_BUCKETS
+)
+
+
+class GroupCommit(Generic[Item, Result]):
+    """
+    Coalesces concurrent ingest requests into one transaction. The first
+    request waits up to max_delay seconds for others, or until max_rows rows
+    are pending; write() then runs in a worker thread for all of them and each
+    request gets back the results for its own items. Requests arriving during
+    a commit form the next group, so at most one transaction is in flight;
+    a request waits at most max_delay plus the commits ahead of it.
+    max_rows <= 0 disables grouping: every request is written on its own.
+    """
+
+    def __init__(self, write: Callable[[List[Item]], List[Result]], max_delay: float, max_rows: int):
+        self.write = write
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        # (items, their future, arrival time) per waiting request
+        self._pending: List[Tuple[List[Item], asyncio.Future, float]] = []
+        self._pending_rows = 0
+        self._arrived: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def submit(self, items: List[Item]) -> List[Result]:
+        """Write items, together with those of concurrent requests; returns write()'s results for them"""
+        if not items:
+            return []
+        if self.max_rows <= 0:
+            group_commit_requests.observe(1)
+            return await asyncio.to_thread(self.write, items)
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((items, future, loop.time()))
+        self._pending_rows += len(items)
+        self._arrived.set()
+        return await future
+
+    async def stop(self) -> None:
+        """Write what is pending, then stop the worker"""
+        if self._worker is None or self._worker.done():
+            self._worker = None
+            return
+        self._stopping = True
+        self._arrived.set()
+        try:
+            await self._worker
+        finally:
+            self._worker = None
+            self._stopping = False
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        # A worker left over from a closed event loop (e.g. between test clients) is replaced
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._arrived = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            if self._stopping and not self._pending:
+                return
+            deadline = self._pending[0][2] + self.max_delay
+            while self._pending_rows < self.max_rows and not self._stopping:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            group = self._take()
+            if not self._pending and not self._stopping:
+                self._arrived.clear()
+            await self._commit(group)
+
+    def _take(self) -> List[Tuple[List[Item], asyncio.Future, float]]:
+        """Whole requests up to max_rows rows, at least one"""
+        count, rows = 0, 0
+        for items, _, _ in self._pending:
+            if count and rows + len(items) > self.max_rows:
+                break
+            count += 1
+            rows += len(items)
+        group, self._pending = self._pending[:count], self._pending[count:]
+        self._pending_rows -= rows
+        return group
+
+    async def _commit(self, group: List[Tuple[List[Item], asyncio.Future, float]]):
+        try:
+            results = await asyncio.to_thread(self.write, [item for items, _, _ in group for item in items])
+        except Exception as e:
+            if len(group) > 1:
+                # Retry the requests one by one so only the failing one gets the error
+                logging.warning(f"Group commit of {len(group)} requests failed, retrying separately: {e}")
+                for request in group:
+                    await self._commit([request])
+                return
+            results, error = None, e
+        group_commit_requests.observe(len(group))
+        offset = 0
+        for items, future, _ in group:
+            # A request whose client went away is written all the same
+            if not future.done():
+                if results is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
@@ -0,0 +1,104 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from metrics import Counter
+from config import (
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_QUEUE_SIZE,
+    LOG_PAYLOAD_RATE,
+    LOG_PAYLOAD_MAX_CHARS,
+)
+
+LOG_FORMAT = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
+
+dropped_records = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records are dropped when the queue is full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # Waits for room so stop() always works
+
+    def stop(self):
+        if self._thread:  # Already stopped
+            super().stop()
+
+
+def configure_logging(level=LOG_LEVEL, log_file=LOG_FILE) -> QueueListener:
+    """
+    Send log records through a bounded queue to a listener thread that does
+    the console and file I/O, so logging in hot paths costs a queue put.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]  # Output log messages to the console
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))  # Save log messages to a file
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [_DroppingQueueHandler(log_queue)]
+    return listener
+
+
+class PayloadSampler:
+    """
+    Token bucket deciding which log lines may carry a full payload.
+    At most `rate` payloads per second get through, each cut to max_chars;
+    a rate below 1 lets one through every 1 / rate seconds. The others are
+    replaced by a placeholder without building the payload.
+    """
+
+    def __init__(self, rate: float, max_chars: int):
+        self.rate = rate
+        self.max_chars = max_chars
+        # Room for at least one token, or rates below 1 would never log
+        self.capacity = max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Called from request handler and client threads alike
+        self._lock = threading.Lock()
+
+    def _take(self) -> bool:
+        if self.rate <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def __call__(self, payload) -> str:
+        """payload is a string or a callable building it"""
+        if not self._take():
+            return "<payload not sampled>"
+        text = str(payload() if callable(payload) else payload)
+        if len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}... ({len(text)} chars)"
+        return text
+
+
+sample_payload = PayloadSampler(LOG_PAYLOAD_RATE, LOG_PAYLOAD_MAX_CHARS)
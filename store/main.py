@@ -1,212 +1,578 @@
 import asyncio
 import json
-from typing import Set, Dict, List, Any
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, List, Any, Optional
 
+import anyio.from_thread
 import uvicorn
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Body
-from sqlalchemy import (
-    create_engine,
-    MetaData,
-    Table,
-    Column,
-    Integer,
-    String,
-    Float,
-    DateTime,
-)
-from sqlalchemy.orm import sessionmaker
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Body, Header, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import select, delete, update
-from datetime import datetime
-from pydantic import BaseModel, field_validator
+from datetime import datetime, timezone
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
 from pydantic.json import pydantic_encoder
+import models
+from models.modelsDB import ProcessedAgentDataInDB, RoadStateAggregate, RoadDefect
+from models.modelsFastAPI import (
+    ProcessedAgentData,
+    ProcessedAgentDataFilter,
+    ProcessedAgentDataBulkUpdate,
+    BulkResult,
+    SubscriptionFilter,
+)
+from database import engine, metadata, processed_agent_data, SessionLocal, dialect_insert, stored_timestamp
+from aggregates import update_road_state_aggregates, select_road_state_aggregates
+from defects import defect_index, update_road_defects, select_road_defects, confidence
+from partitions import ensure_partitions, maintain_partitions
+from cache import record_cache
+from subscriptions import Subscription, SubscriptionIndex
+from fleet import fleet_state, select_latest_of_device, select_latest_per_device
+from broadcast import create_broadcast
+from group_commit import GroupCommit
+from export import FORMATS, parse_columns, stream_export
+from tracing import record_hop, observe_latency, latency_report
+from metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, render
+from logging_config import configure_logging
 from config import (
-    POSTGRES_HOST,
-    POSTGRES_PORT,
-    POSTGRES_DB,
-    POSTGRES_USER,
-    POSTGRES_PASSWORD,
+    PARTITION_MAINTENANCE_INTERVAL,
+    WS_INDEX_CELL_SIZE,
+    WS_INDEX_MAX_CELLS,
+    INGEST_COMMIT_DELAY,
+    INGEST_COMMIT_MAX_ROWS,
 )
-import models
-from models.modelsDB import ProcessedAgentDataInDB
-from models.modelsFastAPI import ProcessedAgentData
 import random
 
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
-# Define the ProcessedAgentData table
-processed_agent_data = Table(
-    "processed_agent_data",
-    metadata,
-Column("id", Integer, primary_key=True, index=True),
-    Column("road_state", String),
-    Column("x", Float),
-    Column("y", Float),
-    Column("z", Float),
-    Column("latitude", Float),
-    Column("longitude", Float),
-    Column("timestamp", DateTime),
-)
-SessionLocal = sessionmaker(bind=engine)
+configure_logging()
 metadata.create_all(engine)
 
+# Metrics
+rows_inserted = Counter("store_rows_inserted_total", "Rows inserted into processed_agent_data")
+rows_duplicate = Counter("store_rows_duplicate_total", "Records skipped as already stored (same user_id and timestamp)")
+insert_batch_size = Histogram("store_insert_batch_size", "Rows per insert transaction", buckets=SIZE_BUCKETS)
+insert_duration = Histogram("store_insert_duration_seconds", "Time to insert and commit one transaction")
+db_pool_checked_out = Gauge("store_db_pool_checked_out", "Database connections in use")
+db_pool_checked_out.set_function(lambda: getattr(engine.pool, "checkedout", lambda: 0)())
+db_pool_size = Gauge("store_db_pool_size", "Database connection pool size")
+db_pool_size.set_function(lambda: getattr(engine.pool, "size", lambda: 0)())
+ws_messages_sent = Counter("store_ws_messages_sent_total", "Websocket messages sent")
+ws_dropped_sends = Counter("store_ws_dropped_sends_total", "Websocket sends to disconnected clients")
+
+
+async def run_partition_maintenance():
+    """Periodically create upcoming partitions and apply retention"""
+    while True:
+        try:
+            if await asyncio.to_thread(maintain_partitions):
+                # Rows of dropped partitions may still be cached
+                record_cache.clear()
+        except Exception as e:
+            logging.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    maintenance = asyncio.create_task(run_partition_maintenance())
+    await broadcast.start(send_messages_to_subscribers)
+    await asyncio.to_thread(load_fleet_state)
+    yield
+    await ingest.stop()
+    await broadcast.stop()
+    maintenance.cancel()
+
+
 # FastAPI app setup
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # WebSocket subscriptions
-subscriptions: Set[WebSocket] = set()
+subscriptions = SubscriptionIndex(WS_INDEX_CELL_SIZE, WS_INDEX_MAX_CELLS)
+# Inserts reach the subscribers of every worker through the broadcast
+broadcast = create_broadcast()
+Gauge("store_ws_subscribers", "Connected websocket clients").set_function(lambda: len(subscriptions))
+ws_rate_limited = Counter("store_ws_rate_limited_total", "Websocket messages skipped by max_rate")
 
 # FastAPI WebSocket endpoint
 import random
 
 
 @app.websocket("/ws/")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    bbox: Optional[str] = None,
+    user_id: Optional[List[int]] = Query(None),
+    road_state: Optional[List[str]] = Query(None),
+    max_rate: Optional[float] = None,
+):
+    """
+    The latest record of every device, then live records, optionally filtered:
+    ?bbox=min_lon,min_lat,max_lon,max_lat, repeated user_id and road_state,
+    max_rate in messages per second (live records only). A client
+    can change its filter by sending the same fields as JSON
+    ({"bbox": [...], "user_ids": [...], "road_states": [...], "max_rate": ...}).
+    """
+    try:
+        subscription_filter = SubscriptionFilter(
+            bbox=bbox.split(",") if bbox else None,
+            user_ids=user_id,
+            road_states=road_state,
+            max_rate=max_rate,
+        )
+    except ValidationError as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
     await websocket.accept()
-    subscriptions.add(websocket)
+    subscription = Subscription(websocket, subscription_filter)
 
     try:
+        # Start with the current position of every matching device
+        for data in fleet_state.snapshot():
+            if subscription.matches(data):
+                await websocket.send_json(data)
+        subscriptions.add(subscription)
         while True:
-            with SessionLocal() as session:
-                query = select(
-                    processed_agent_data.c.latitude,
-                    processed_agent_data.c.longitude,
-                    processed_agent_data.c.road_state
-                ).order_by(processed_agent_data.c.timestamp.desc()).limit(1)
-
-                result = session.execute(query).fetchone()
-            if result:
-                latitude, longitude, road_state = result
-                if road_state is None:
-                    road_state = "normal"
-
-                data = {
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "road_state": road_state
-                }
-                await send_data_to_subscribers(data)
-            await asyncio.sleep(1)
-
+            try:
+                subscriptions.update(subscription, SubscriptionFilter.model_validate(
+                    await websocket.receive_json()
+                ))
+            except (ValidationError, ValueError) as e:
+                await websocket.send_json({"error": str(e)})
     except WebSocketDisconnect:
-        subscriptions.remove(websocket)
+        pass
+    finally:
+        subscriptions.discard(subscription)
+
+
+def load_fleet_state():
+    """Read every device's latest row into fleet_state; scans the index, so at startup only"""
+    columns = [processed_agent_data.c[name] for name in SUBSCRIBER_COLUMNS]
+
+    def fetch():
+        # Queried inside reload(), so inserts broadcast meanwhile are kept
+        with SessionLocal() as session:
+            rows = session.execute(select_latest_per_device(*columns)).all()
+        return map(to_subscriber_message, rows)
+
+    fleet_state.reload(fetch)
+
+
+def refresh_fleet_devices(user_ids: Iterable[Optional[int]]):
+    """Re-read the latest row of the devices a change touched, one index probe each"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    columns = [processed_agent_data.c[name] for name in SUBSCRIBER_COLUMNS]
+
+    def fetch():
+        with SessionLocal() as session:
+            rows = [session.execute(select_latest_of_device(user_id, *columns)).first() for user_id in user_ids]
+        return [to_subscriber_message(row) for row in rows if row is not None]
+
+    fleet_state.reload(fetch, user_ids)
+
+
+# Tells this worker's own fleet change notices apart from the other workers'
+WORKER_ID = uuid.uuid4().hex
+# Devices per fleet change notice, keeping one under the NOTIFY payload limit
+FLEET_CHANGE_CHUNK = 500
+
+
+def change_fleet_devices(user_ids: Iterable[Optional[int]]):
+    """
+    Refresh the devices an update or delete touched here, then have every
+    other worker refresh them too through the broadcast. Called from the
+    threadpool of a sync endpoint, so the publish runs on the event loop.
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return
+    refresh_fleet_devices(user_ids)
+    notices = [
+        {"fleet_changed": user_ids[start:start + FLEET_CHANGE_CHUNK], "worker": WORKER_ID}
+        for start in range(0, len(user_ids), FLEET_CHANGE_CHUNK)
+    ]
+    anyio.from_thread.run(broadcast.publish, notices)
+
+
+SUBSCRIBER_COLUMNS = ("id", "user_id", "latitude", "longitude", "road_state", "timestamp")
+
+
+def to_subscriber_message(row) -> Dict[str, Any]:
+    """Build the websocket message for a stored row; "id" is the clients' resume token"""
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "road_state": row.road_state or "normal",
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+    }
+
+
+async def send_messages_to_subscribers(messages: List[Dict[str, Any]]):
+    # Fleet change notices are for the workers, not the websocket clients
+    changed = set()
+    for notice in messages:
+        if "fleet_changed" in notice and notice["worker"] != WORKER_ID:
+            changed.update(notice["fleet_changed"])
+    messages = [data for data in messages if "fleet_changed" not in data]
+    fleet_state.update(messages)
+    for data in messages:
+        await send_data_to_subscribers(data)
+    if changed:
+        await asyncio.to_thread(refresh_fleet_devices, changed)
 
 
 async def send_data_to_subscribers(data):
-    """Sending data to all subscribed clients"""
-    disconnected_clients = []
-    for websocket in subscriptions:
+    """Sending data to the subscribed clients whose filter matches it"""
+    disconnected = []
+    for subscription in subscriptions.match(data):
+        if not subscription.take():
+            ws_rate_limited.inc()
+            continue
         try:
-            await websocket.send_json(data)
-        except WebSocketDisconnect:
-            disconnected_clients.append(websocket)
+            await subscription.websocket.send_json(data)
+            ws_messages_sent.inc()
+        except (WebSocketDisconnect, RuntimeError):
+            ws_dropped_sends.inc()
+            disconnected.append(subscription)
+
+    for subscription in disconnected:
+        subscriptions.discard(subscription)
+
 
-    for websocket in disconnected_clients:
-        subscriptions.remove(websocket)
+# Validates a whole batch straight from the request bytes
+processed_agent_data_batch = TypeAdapter(List[ProcessedAgentData])
 
 
 # FastAPI CRUDL endpoints
 @app.post("/processed_agent_data/")
-async def create_processed_agent_data(data: List[ProcessedAgentData]):
-    # Insert data to database
-    print("Creating processed agent data...")
-
-    with SessionLocal() as session:
+async def receive_processed_agent_data(
+    request: Request, x_hub_flush_time: Optional[float] = Header(None)
+):
+    try:
+        data = processed_agent_data_batch.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+    if x_hub_flush_time is not None:
         for item in data:
-            query = processed_agent_data.insert().values(
+            record_hop(item.agent_data.trace, "hub_flush", x_hub_flush_time)
+    await create_processed_agent_data(data)
+
+
+def natural_key(user_id: Optional[int], timestamp: Optional[datetime]) -> tuple:
+    return user_id, stored_timestamp(timestamp)
+
+
+@contextmanager
+def rollback_defects_on_error():
+    # The defect index is changed before the transaction commits
+    try:
+        yield
+    except Exception:
+        defect_index.invalidate()
+        raise
+
+
+def insert_processed_agent_data(data: List[ProcessedAgentData]) -> list:
+    """
+    Insert records and their aggregates in one transaction; runs in a worker thread.
+    A record whose (user_id, timestamp) is already stored, or repeated in data,
+    is skipped. Returns the inserted row per record, None for skipped ones.
+    """
+    keys = [natural_key(item.agent_data.user_id, item.agent_data.timestamp) for item in data]
+    ensure_partitions(timestamp for _, timestamp in keys)
+
+    started = time.perf_counter()
+    with SessionLocal() as session, rollback_defects_on_error():
+        query = dialect_insert(processed_agent_data).on_conflict_do_nothing(
+            index_elements=[processed_agent_data.c.user_id, processed_agent_data.c.timestamp]
+        ).returning(processed_agent_data)
+        rows = session.execute(query, [
+            dict(
+                user_id=user_id,
                 road_state=item.road_state,
                 x=item.agent_data.accelerometer.x,
                 y=item.agent_data.accelerometer.y,
                 z=item.agent_data.accelerometer.z,
                 latitude=item.agent_data.gps.latitude,
                 longitude=item.agent_data.gps.longitude,
-                timestamp=item.agent_data.timestamp,
+                timestamp=timestamp,
             )
-            session.execute(query)
+            for item, (user_id, timestamp) in zip(data, keys)
+        ]).all()
+        # Only new rows count towards the aggregates and road defects
+        update_road_state_aggregates(session, rows)
+        update_road_defects(session, rows)
 
         session.commit()
-        print("Processed agent data was created!")
+        logging.debug("Processed agent data was created!")
+    insert_duration.observe(time.perf_counter() - started)
+    insert_batch_size.observe(len(data))
+    rows_inserted.inc(len(rows))
+    rows_duplicate.inc(len(data) - len(rows))
+
+    # RETURNING leaves out skipped records, so rows are matched back by key
+    inserted = {(row.user_id, row.timestamp): row for row in rows}
+    return [inserted.pop(key, None) for key in keys]
+
+
+# Concurrent POSTs share one transaction instead of paying a commit each
+ingest = GroupCommit(insert_processed_agent_data, INGEST_COMMIT_DELAY, INGEST_COMMIT_MAX_ROWS)
+
 
-    # Send data to subscribers
-    await send_data_to_subscribers(data)
+async def create_processed_agent_data(data: List[ProcessedAgentData]):
+    # Insert data to database
+    logging.debug("Creating processed agent data...")
+    if not data:
+        return
+    rows = [row for row in await ingest.submit(data) if row is not None]
+
+    committed = time.time()
+    for item in data:
+        trace = item.agent_data.trace
+        record_hop(trace, "store_commit", committed)
+        if trace is not None:
+            observe_latency("end_to_end", committed - next(iter(trace.hops.values())))
+
+    # Send data to subscribers of all workers
+    await broadcast.publish([to_subscriber_message(row) for row in rows])
+    published = time.time()
+    for item in data:
+        record_hop(item.agent_data.trace, "ws_send", published)
+
+@app.get("/fleet/positions/")
+def list_fleet_positions():
+    """Latest known position and road state of every device, from memory"""
+    return fleet_state.snapshot()
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/latency/")
+def get_latency():
+    """Per-stage hop latency histograms, including agent to store end_to_end"""
+    return latency_report()
+
+@app.get("/processed_agent_data/export")
+def export_processed_agent_data(
+    format: str = "arrow",
+    columns: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = Query(10000, gt=0),
+):
+    """
+    Bulk export in columnar form: an Arrow IPC stream or a Parquet file,
+    written batch by batch straight from the database cursor.
+    columns is a comma separated projection, all columns by default.
+    """
+    logging.debug("Exporting processed agent data...")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    try:
+        column_names = parse_columns(columns)
+    except ValueError as e:
+        # Invalid query parameter, like a batch_size below 1
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return StreamingResponse(
+        stream_export(format, column_names, start, end, batch_size),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="processed_agent_data.{format}"'},
+    )
 
 @app.get("/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB)
 def read_processed_agent_data(processed_agent_data_id: int):
     # Get data by id
-    print("Reading processed agent data by id...")
+    logging.debug("Reading processed agent data by id...")
+    cached = record_cache.get(processed_agent_data_id)
+    if cached is not None:
+        return cached
+    # Taken before the query: a change committed after it stops the fill below
+    generation = record_cache.generation(processed_agent_data_id)
 
     with SessionLocal() as session:
-        # print(processed_agent_data_id)
         query = select(processed_agent_data).where(
             processed_agent_data.c.id == processed_agent_data_id
         )
 
         result = session.execute(query).first()
-        print("Result: ", result)
+        logging.debug("Result: %s", result)
 
         if result is None:
-            print("Data not found")
+            logging.debug("Data not found")
             raise HTTPException(status_code=404, detail="Data not found")
 
-        return result
+        record = ProcessedAgentDataInDB(**result._mapping)
+        record_cache.set(record, generation)
+        return record
 
 @app.get("/processed_agent_data/",
     response_model=list[ProcessedAgentDataInDB])
-def list_processed_agent_data():
-    # Get list of data
-    print("Listing processed agent data...")
+def list_processed_agent_data(since_id: Optional[int] = None, limit: Optional[int] = None):
+    # Get list of data, optionally only rows after a client's resume token
+    logging.debug("Listing processed agent data...")
 
     with SessionLocal() as session:
         query = select(processed_agent_data)
+        if since_id is not None:
+            query = query.where(
+                processed_agent_data.c.id > since_id
+            ).order_by(processed_agent_data.c.id)
+        if limit is not None:
+            query = query.limit(limit)
 
         result = session.execute(query)
-        print("Result: ", result)
+        logging.debug("Result: %s", result)
 
         if result is None:
-            print("Data not found")
+            logging.debug("Data not found")
             raise HTTPException(status_code=404, detail="Data not found")
 
         return result
 
+@app.get("/processed_agent_data/track/{user_id}")
+def read_track(
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = Query(500, gt=0),
+):
+    """
+    Stream a device's track ordered by time as NDJSON.
+    Every line is one chunk of up to chunk_size points in columnar form:
+    {"id": [...], "t": [...], "latitude": [...], "longitude": [...], "road_state": [...]}
+    where "t" is a unix timestamp in seconds.
+    """
+    logging.debug("Streaming track...")
+
+    query = select(
+        processed_agent_data.c.id,
+        processed_agent_data.c.timestamp,
+        processed_agent_data.c.latitude,
+        processed_agent_data.c.longitude,
+        processed_agent_data.c.road_state,
+    ).where(
+        processed_agent_data.c.user_id == user_id
+    ).order_by(processed_agent_data.c.timestamp)
+    if start is not None:
+        query = query.where(processed_agent_data.c.timestamp >= stored_timestamp(start))
+    if end is not None:
+        query = query.where(processed_agent_data.c.timestamp < stored_timestamp(end))
+
+    return StreamingResponse(
+        stream_track(query, chunk_size), media_type="application/x-ndjson"
+    )
+
+
+def stream_track(query, chunk_size: int):
+    # Server-side cursor, so only one chunk is held in memory at a time
+    with SessionLocal() as session:
+        result = session.execute(
+            query.execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        for rows in result.partitions():
+            chunk = {
+                "id": [row.id for row in rows],
+                # Stored naive as UTC; .timestamp() alone would assume the host's time zone
+                "t": [row.timestamp.replace(tzinfo=timezone.utc).timestamp() for row in rows],
+                "latitude": [row.latitude for row in rows],
+                "longitude": [row.longitude for row in rows],
+                "road_state": [row.road_state or "normal" for row in rows],
+            }
+            yield json.dumps(chunk) + "\n"
+
+@app.get("/road_state_aggregates/",
+    response_model=list[RoadStateAggregate])
+def list_road_state_aggregates(
+    geohash: str = "",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    road_state: Optional[str] = None,
+    precision: Optional[int] = None,
+):
+    # Get detection counts per geohash cell and hour, e.g. for heatmaps
+    logging.debug("Listing road state aggregates...")
+
+    with SessionLocal() as session:
+        query = select_road_state_aggregates(
+            geohash, stored_timestamp(start), stored_timestamp(end), road_state, precision
+        )
+        return session.execute(query).all()
+
+@app.get("/road_defects/", response_model=list[RoadDefect])
+def list_road_defects(
+    bbox: Optional[str] = None,
+    road_state: Optional[str] = None,
+    min_hits: int = 1,
+    since: Optional[datetime] = None,
+    limit: int = 1000,
+):
+    """
+    Potholes and bumps merged from repeated detections, most hits first.
+    bbox is min_lon,min_lat,max_lon,max_lat; since filters on last_seen.
+    """
+    try:
+        bounds = tuple(float(value) for value in bbox.split(",")) if bbox else None
+    except ValueError:
+        bounds = ()
+    if bounds is not None and len(bounds) != 4:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+
+    with SessionLocal() as session:
+        rows = session.execute(select_road_defects(bounds, road_state, min_hits, stored_timestamp(since), limit)).all()
+    return [RoadDefect(**row._mapping, confidence=confidence(row.hits)) for row in rows]
+
+# Changes that would give two rows the same natural key
+DUPLICATE_DETAIL = "A record with this user_id and timestamp already exists"
+
 @app.put(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB)
 def update_processed_agent_data(processed_agent_data_id: int, data: ProcessedAgentData):
     # Update data
-    print("Updating processed agent data by id...")
+    logging.debug("Updating processed agent data by id...")
+    user_id, timestamp = natural_key(data.agent_data.user_id, data.agent_data.timestamp)
+    ensure_partitions([timestamp])
 
     with SessionLocal() as session:
-        query = select(processed_agent_data).where(
-            processed_agent_data.c.id == processed_agent_data_id)
-
-        result = session.execute(query).first()
-        print("Result: ", result)
-
-        if result is None:
-            print("Data not found")
-            raise HTTPException(status_code=404, detail="Data not found")
-
         query = update(processed_agent_data).where(
             processed_agent_data.c.id == processed_agent_data_id
         ).values(
+            user_id=user_id,
             road_state=data.road_state,
             x=data.agent_data.accelerometer.x,
             y=data.agent_data.accelerometer.y,
             z=data.agent_data.accelerometer.z,
             latitude=data.agent_data.gps.latitude,
             longitude=data.agent_data.gps.longitude,
-            timestamp=data.agent_data.timestamp,
-        )
+            timestamp=timestamp,
+        ).returning(processed_agent_data)
 
-        session.execute(query)
-        session.commit()
+        try:
+            result = session.execute(query).first()
+        except IntegrityError:
+            raise HTTPException(status_code=409, detail=DUPLICATE_DETAIL)
+        logging.debug("Result: %s", result)
 
-        query = select(processed_agent_data).where(
-            processed_agent_data.c.id == processed_agent_data_id)
-        result = session.execute(query).first()
-        print("Result: ", result)
+        if result is None:
+            logging.debug("Data not found")
+            raise HTTPException(status_code=404, detail="Data not found")
 
+        session.commit()
+        record_cache.invalidate([processed_agent_data_id])
+        # The row may now be, or no longer be, its devices' latest
+        change_fleet_devices({result.user_id} | fleet_state.user_ids_holding([processed_agent_data_id]))
         return result
 
 
@@ -214,26 +580,77 @@ def update_processed_agent_data(processed_agent_data_id: int, data: ProcessedAge
     response_model=ProcessedAgentDataInDB)
 def delete_processed_agent_data(processed_agent_data_id: int):
     # Delete by id
-    print("Deleting processed_agent_data by id...")
+    logging.debug("Deleting processed_agent_data by id...")
 
     with SessionLocal() as session:
-        query = select(processed_agent_data).where(
-            processed_agent_data.c.id == processed_agent_data_id)
+        query = delete(processed_agent_data).where(
+            processed_agent_data.c.id == processed_agent_data_id
+        ).returning(processed_agent_data)
+
         result = session.execute(query).first()
-        print("Result: ", result)
+        logging.debug("Result: %s", result)
 
         if result is None:
-            print("Data not found")
+            logging.debug("Data not found")
             raise HTTPException(status_code=404, detail="Data not found")
 
-        query = delete(processed_agent_data).where(
-            processed_agent_data.c.id == processed_agent_data_id
+        session.commit()
+        record_cache.invalidate([processed_agent_data_id])
+        change_fleet_devices(fleet_state.user_ids_holding([processed_agent_data_id]))
+        logging.debug(f"{processed_agent_data_id} was deleted!")
+        return result
+
+
+def filter_clauses(data_filter: ProcessedAgentDataFilter) -> list:
+    """WHERE clauses of a bulk filter; the time range lets Postgres prune partitions"""
+    clauses = []
+    if data_filter.ids is not None:
+        clauses.append(processed_agent_data.c.id.in_(data_filter.ids))
+    if data_filter.user_id is not None:
+        clauses.append(processed_agent_data.c.user_id == data_filter.user_id)
+    if data_filter.start is not None:
+        clauses.append(processed_agent_data.c.timestamp >= stored_timestamp(data_filter.start))
+    if data_filter.end is not None:
+        clauses.append(processed_agent_data.c.timestamp < stored_timestamp(data_filter.end))
+    return clauses
+
+
+@app.patch("/processed_agent_data/", response_model=BulkResult)
+def bulk_update_processed_agent_data(data: ProcessedAgentDataBulkUpdate):
+    """Apply the same changes to every row matching the filter, in one statement"""
+    with SessionLocal() as session:
+        query = update(processed_agent_data).where(
+            *filter_clauses(data.filter)
+        ).values(**data.changes.model_dump(exclude_none=True)).returning(
+            processed_agent_data.c.id, processed_agent_data.c.user_id
         )
+        try:
+            rows = session.execute(query).all()
+        except IntegrityError:
+            raise HTTPException(status_code=409, detail=DUPLICATE_DETAIL)
+        session.commit()
+    ids = [row.id for row in rows]
+    record_cache.invalidate(ids)
+    if ids:
+        change_fleet_devices({row.user_id for row in rows} | fleet_state.user_ids_holding(ids))
+    logging.debug(f"{len(ids)} rows were updated")
+    return BulkResult(count=len(ids))
+
 
-        session.execute(query)
+@app.delete("/processed_agent_data/", response_model=BulkResult)
+def bulk_delete_processed_agent_data(data_filter: ProcessedAgentDataFilter):
+    """Delete every row matching the filter, in one statement"""
+    with SessionLocal() as session:
+        query = delete(processed_agent_data).where(
+            *filter_clauses(data_filter)
+        ).returning(processed_agent_data.c.id)
+        ids = session.execute(query).scalars().all()
         session.commit()
-        print(f"{processed_agent_data_id} was deleted!")
-        return result
+    record_cache.invalidate(ids)
+    if ids:
+        change_fleet_devices(fleet_state.user_ids_holding(ids))
+    logging.debug(f"{len(ids)} rows were deleted")
+    return BulkResult(count=len(ids))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -1,10 +1,12 @@
 # Database model
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 
 
 class ProcessedAgentDataInDB(BaseModel):
     id: int
+    user_id: Optional[int] = None
     road_state: str
     x: float
     y: float
@@ -12,3 +14,22 @@ class ProcessedAgentDataInDB(BaseModel):
     latitude: float
     longitude: float
     timestamp: datetime
+
+
+class RoadStateAggregate(BaseModel):
+    geohash: str
+    hour: datetime
+    road_state: str
+    count: int
+
+
+class RoadDefect(BaseModel):
+    id: int
+    road_state: str
+    latitude: float
+    longitude: float
+    hits: int
+    # hits / (hits + DEFECT_CONFIDENCE_HITS)
+    confidence: float
+    first_seen: datetime
+    last_seen: datetime
@@ -1,6 +1,7 @@
 # FastAPI models
 from datetime import datetime
-from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 # FastAPI models
 class AccelerometerData(BaseModel):
@@ -12,10 +13,17 @@ class GpsData(BaseModel):
     latitude: float
     longitude: float
 
+class Trace(BaseModel):
+    id: str
+    # Stage name -> unix time the message passed it, in hop order
+    hops: Dict[str, float]
+
 class AgentData(BaseModel):
+    user_id: int
     accelerometer: AccelerometerData
     gps: GpsData
     timestamp: datetime
+    trace: Optional[Trace] = None
 
     @classmethod
     @field_validator('timestamp', mode='before')
@@ -30,3 +38,46 @@ class AgentData(BaseModel):
 class ProcessedAgentData(BaseModel):
     road_state: str
     agent_data: AgentData
+
+class ProcessedAgentDataFilter(BaseModel):
+    # Rows matching all given criteria; at least one is required
+    ids: Optional[List[int]] = None
+    user_id: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @model_validator(mode='after')
+    def check_not_empty(self):
+        if self.ids is None and self.user_id is None and self.start is None and self.end is None:
+            raise ValueError("At least one of ids, user_id, start, end is required")
+        return self
+
+class ProcessedAgentDataChanges(BaseModel):
+    road_state: Optional[str] = None
+    user_id: Optional[int] = None
+
+class ProcessedAgentDataBulkUpdate(BaseModel):
+    filter: ProcessedAgentDataFilter
+    changes: ProcessedAgentDataChanges
+
+    @model_validator(mode='after')
+    def check_changes(self):
+        if not self.changes.model_dump(exclude_none=True):
+            raise ValueError("No changes given")
+        return self
+
+class BulkResult(BaseModel):
+    count: int
+
+class SubscriptionFilter(BaseModel):
+    # Websocket subscription; records must match every given criterion
+    bbox: Optional[Tuple[float, float, float, float]] = None  # min_lon, min_lat, max_lon, max_lat
+    user_ids: Optional[Set[int]] = None
+    road_states: Optional[Set[str]] = None
+    max_rate: Optional[float] = Field(None, gt=0)  # messages per second
+
+    @field_validator('bbox')
+    def check_bbox(cls, value):
+        if value is not None and (value[0] > value[2] or value[1] > value[3]):
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        return value
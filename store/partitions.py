@@ -0,0 +1,123 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from config import (
+    PARTITION_INTERVAL,
+    PARTITION_PRECREATE,
+    PARTITION_RETENTION_DAYS,
+)
+from database import engine, partitioned, processed_agent_data
+
+PARTITION_PREFIX = f"{processed_agent_data.name}_p"
+
+# Partitions known to exist, so the insert path skips the DDL round trip
+_known_partitions: Set[str] = set()
+# Whether the table in the database is partitioned, checked on first use
+_table_partitioned: Optional[bool] = None
+
+
+def table_partitioned() -> bool:
+    """
+    Whether processed_agent_data in the database is partitioned. A table
+    created before partitioning is not, and create_all() leaves it as is.
+    """
+    global _table_partitioned
+    if _table_partitioned is None:
+        if not partitioned:
+            _table_partitioned = False
+        else:
+            query = text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid))"
+            )
+            with engine.connect() as connection:
+                _table_partitioned = connection.execute(query, {"name": processed_agent_data.name}).scalar()
+            if not _table_partitioned:
+                logging.warning(
+                    f"{processed_agent_data.name} is not partitioned, partition management is off; "
+                    "recreate it from docker/db/structure.sql to enable it"
+                )
+    return _table_partitioned
+
+
+def partition_bounds(timestamp: datetime) -> Tuple[datetime, datetime]:
+    """Start (inclusive) and end (exclusive) of the partition holding timestamp"""
+    start = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if PARTITION_INTERVAL == "week":
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(weeks=1)
+    return start, start + timedelta(days=1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def ensure_partitions(timestamps: Iterable[datetime]) -> None:
+    """
+    Create the partitions needed for rows with the given timestamps.
+    The DDL commits in its own short transaction, so the cache stays valid
+    even if the caller's insert rolls back.
+    """
+    if not table_partitioned():
+        return
+    missing = {partition_bounds(ts) for ts in timestamps if ts is not None}
+    missing = [bounds for bounds in missing if partition_name(bounds[0]) not in _known_partitions]
+    if not missing:
+        return
+    with engine.begin() as connection:
+        for start, end in sorted(missing):
+            name = partition_name(start)
+            # Serializes concurrent creation of the same partition by several workers
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {processed_agent_data.name} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+    _known_partitions.update(partition_name(start) for start, _ in missing)
+
+
+def list_partitions(connection) -> Set[str]:
+    query = text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent"
+    )
+    return set(connection.execute(query, {"parent": processed_agent_data.name}).scalars())
+
+
+def maintain_partitions(now: datetime = None) -> List[str]:
+    """
+    Create upcoming partitions and drop the ones past retention; returns the
+    dropped partition names. Road state aggregates are updated when rows are
+    inserted, so they already hold the rollup of a partition by the time it is dropped.
+    """
+    dropped = []
+    if not table_partitioned():
+        return dropped
+    # Rows are stored as naive UTC, so the partition boundaries are UTC too
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    upcoming = [now]
+    for _ in range(PARTITION_PRECREATE):
+        upcoming.append(partition_bounds(upcoming[-1])[1])
+    ensure_partitions(upcoming)
+    if not PARTITION_RETENTION_DAYS:
+        return dropped
+
+    with engine.begin() as connection:
+        cutoff = now - timedelta(days=PARTITION_RETENTION_DAYS)
+        for name in sorted(list_partitions(connection)):
+            if not name.startswith(PARTITION_PREFIX):
+                continue
+            start = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d")
+            if partition_bounds(start)[1] <= cutoff:
+                connection.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                _known_partitions.discard(name)
+                dropped.append(name)
+                logging.info(f"Dropped partition {name} past retention")
+    return dropped
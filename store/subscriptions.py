@@ -0,0 +1,127 @@
+import math
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from models.modelsFastAPI import SubscriptionFilter
+
+Cell = Tuple[int, int]
+
+
+class Subscription:
+    """A websocket client and the records it asked for"""
+
+    def __init__(self, websocket: WebSocket, subscription_filter: SubscriptionFilter):
+        self.websocket = websocket
+        self._refilled = time.monotonic()
+        self.set_filter(subscription_filter)
+
+    def set_filter(self, subscription_filter: SubscriptionFilter):
+        self.filter = subscription_filter
+        # Token bucket for max_rate, bursting up to one second's worth
+        self._tokens = self._burst()
+
+    def matches(self, message: dict) -> bool:
+        f = self.filter
+        if f.user_ids is not None and message.get("user_id") not in f.user_ids:
+            return False
+        if f.road_states is not None and message["road_state"] not in f.road_states:
+            return False
+        if f.bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = f.bbox
+            if not (min_lon <= message["longitude"] <= max_lon
+                    and min_lat <= message["latitude"] <= max_lat):
+                return False
+        return True
+
+    def take(self) -> bool:
+        """Spend a token of the max_rate budget; False means the message is skipped"""
+        if self.filter.max_rate is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self._burst(), self._tokens + (now - self._refilled) * self.filter.max_rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _burst(self) -> float:
+        return max(1.0, self.filter.max_rate or 1.0)
+
+
+class SubscriptionIndex:
+    """
+    Finds the subscriptions a record may match without scanning all of them.
+    Each subscription is indexed once: by its user ids if it has any, else by
+    the grid cells its bbox covers, else (no bbox, or one spanning more than
+    max_cells cells) in the unindexed set checked for every record.
+    """
+
+    def __init__(self, cell_size: float, max_cells: int):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._by_cell: Dict[Cell, Set[Subscription]] = {}
+        self._unindexed: Set[Subscription] = set()
+        # Subscription -> the index it is in and its keys there
+        self._entries: Dict[Subscription, Tuple[Optional[dict], list]] = {}
+
+    def add(self, subscription: Subscription) -> None:
+        f = subscription.filter
+        if f.user_ids is not None:
+            index, keys = self._by_user, list(f.user_ids)
+        elif f.bbox is not None and self._cell_count(f.bbox) <= self.max_cells:
+            index, keys = self._by_cell, list(self._cells(f.bbox))
+        else:
+            index, keys = None, []
+            self._unindexed.add(subscription)
+        for key in keys:
+            index.setdefault(key, set()).add(subscription)
+        self._entries[subscription] = (index, keys)
+
+    def discard(self, subscription: Subscription) -> None:
+        entry = self._entries.pop(subscription, None)
+        if entry is None:
+            return
+        index, keys = entry
+        self._unindexed.discard(subscription)
+        for key in keys:
+            bucket = index[key]
+            bucket.discard(subscription)
+            if not bucket:
+                del index[key]
+
+    def update(self, subscription: Subscription, subscription_filter: SubscriptionFilter) -> None:
+        self.discard(subscription)
+        subscription.set_filter(subscription_filter)
+        self.add(subscription)
+
+    def match(self, message: dict) -> List[Subscription]:
+        """Subscriptions whose filter accepts the message, before their max_rate"""
+        candidates = set(self._unindexed)
+        candidates.update(self._by_user.get(message.get("user_id"), ()))
+        candidates.update(self._by_cell.get(self._cell(message["latitude"], message["longitude"]), ()))
+        return [s for s in candidates if s.matches(message)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Subscription]:
+        return iter(list(self._entries))
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def _cells(self, bbox) -> Iterator[Cell]:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        (lat0, lon0), (lat1, lon1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        for lat in range(lat0, lat1 + 1):
+            for lon in range(lon0, lon1 + 1):
+                yield lat, lon
+
+    def _cell_count(self, bbox) -> int:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        (lat0, lon0), (lat1, lon1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        return (lat1 - lat0 + 1) * (lon1 - lon0 + 1)
@@ -0,0 +1,30 @@
+import time
+from typing import Dict, Optional
+
+from metrics import Histogram
+
+hop_latency = Histogram(
+    "hop_latency_seconds", "Time since the previous hop of traced messages", ["stage"]
+)
+
+
+def observe_latency(stage: str, seconds: float) -> None:
+    hop_latency.labels(stage).observe(seconds)
+
+
+def record_hop(trace, stage: str, now: Optional[float] = None) -> None:
+    """
+    Stamp a hop on the message's trace and record the time since the previous
+    hop. Hops are wall-clock times from different hosts, so cross-service
+    latencies are only as accurate as the hosts' clock sync.
+    """
+    if trace is None:
+        return
+    now = time.time() if now is None else now
+    if trace.hops:
+        observe_latency(stage, now - next(reversed(trace.hops.values())))
+    trace.hops[stage] = now
+
+
+def latency_report() -> Dict[str, dict]:
+    return {stage: histogram.snapshot() for (stage,), histogram in hop_latency.children()}